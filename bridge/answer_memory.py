@@ -0,0 +1,148 @@
+"""
+Answer memory for the bridge
+
+Agents ask the human the same clarifying questions over and over (target
+platform, libGDX version, ...). Every answered question is appended to a JSONL
+file, and new questions are matched against past ones with TF-IDF cosine
+similarity. Only direct questions (customer-tool messages by default) are
+stored; whole /generate prompts are agent scratchpads whose boilerplate would
+drown out the real questions. Close matches are offered to the operator as suggestions, and under
+an opt-in policy high-confidence matches are answered automatically.
+"""
+import os
+import re
+import json
+import math
+import time
+import logging
+from collections import Counter, defaultdict
+
+logger = logging.getLogger('CascadeBridge')
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)*")
+
+# Words that say nothing about what is being asked
+_STOP_WORDS = frozenset(
+    "a an and are be can could do does for how i in is it of on or our please should "
+    "that the this to us we what which will with would you your".split()
+)
+
+
+def tokenize(text):
+    """Lower-case word and version-number tokens of a text, without stop words"""
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in _STOP_WORDS]
+
+
+class AnswerMemory:
+    """
+    Past question/answer pairs with similarity search.
+
+    Only answers to prompt kinds listed in record_kinds are stored, and
+    auto-replies are off unless auto_reply is True and only apply to prompt
+    kinds listed in auto_reply_kinds (both by default customer-tool messages,
+    which are short direct questions rather than whole agent scratchpads).
+
+    Each question's TF-IDF vector and norm are computed once when it is
+    stored, with the document frequencies known at that time, so a search
+    only scores the past questions that share a term with the new one.
+    """
+
+    def __init__(self, path="bridge_answers.jsonl", auto_reply=False, auto_reply_threshold=0.9,
+                 suggest_threshold=0.5, auto_reply_kinds=("message",), record_kinds=("message",)):
+        """
+        Args:
+            path: JSONL file the question/answer pairs are stored in, or None to keep them in memory only
+            auto_reply: If True, answer high-confidence matches without asking the human
+            auto_reply_threshold: Minimum similarity for an automatic reply
+            suggest_threshold: Minimum similarity for a suggestion
+            auto_reply_kinds: Prompt kinds that may be answered automatically
+            record_kinds: Prompt kinds whose answers are stored
+        """
+        self.path = path
+        self.auto_reply = auto_reply
+        self.auto_reply_threshold = auto_reply_threshold
+        self.suggest_threshold = suggest_threshold
+        self.auto_reply_kinds = set(auto_reply_kinds)
+        self.record_kinds = set(record_kinds)
+        self.entries = []
+        self._vectors = []
+        self._postings = defaultdict(list)
+        self._document_frequency = Counter()
+        self.auto_replies = 0
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    if entry.get("kind", "message") in self.record_kinds:
+                        self._index(entry)
+                except (json.JSONDecodeError, KeyError):
+                    logger.warning(f"Skipping unreadable line in {self.path}")
+        logger.info(f"Loaded {len(self.entries)} past answers from {self.path}")
+
+    def _index(self, entry):
+        counts = Counter(tokenize(entry["question"]))
+        self.entries.append(entry)
+        self._document_frequency.update(counts.keys())
+        self._vectors.append(self._weights(counts))
+        for term in counts:
+            self._postings[term].append(len(self.entries) - 1)
+
+    def _weights(self, counts):
+        total = len(self.entries) + 1
+        weights = {term: count * (math.log(total / (self._document_frequency[term] + 1)) + 1)
+                   for term, count in counts.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return weights, norm
+
+    def record(self, role, question, answer, kind="message"):
+        """Store an answered question, if its kind is one of record_kinds"""
+        if kind not in self.record_kinds or not question.strip() or not answer.strip():
+            return
+        entry = {"role": role, "kind": kind, "question": question, "answer": answer,
+                 "timestamp": time.time()}
+        self._index(entry)
+        if self.path:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def search(self, question, limit=3):
+        """
+        Find past questions similar to this one
+
+        Returns:
+            List of (similarity, entry) tuples, best first, above suggest_threshold
+        """
+        query, query_norm = self._weights(Counter(tokenize(question)))
+        if not query_norm:
+            return []
+
+        candidates = {index for term in query for index in self._postings.get(term, ())}
+        matches = []
+        for index in candidates:
+            weights, norm = self._vectors[index]
+            score = sum(w * weights.get(term, 0.0) for term, w in query.items()) / (query_norm * norm)
+            if score >= self.suggest_threshold:
+                matches.append((score, self.entries[index]))
+
+        # The same answer may have been given to several similar questions - list it once
+        seen, unique = set(), []
+        for score, entry in sorted(matches, key=lambda match: (-match[0], -match[1]["timestamp"])):
+            if entry["answer"] not in seen:
+                seen.add(entry["answer"])
+                unique.append((score, entry))
+        return unique[:limit]
+
+    def find_auto_reply(self, kind, question):
+        """Return the (similarity, entry) match to send without asking the human, or None"""
+        if not self.auto_reply or kind not in self.auto_reply_kinds:
+            return None
+        matches = self.search(question, limit=1)
+        if matches and matches[0][0] >= self.auto_reply_threshold:
+            self.auto_replies += 1
+            return matches[0]
+        return None
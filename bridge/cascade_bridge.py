@@ -2,15 +2,30 @@
 Example Cascade Bridge integration for CrewSurf
 This file demonstrates how to connect CrewAI agents to Windsurf/Cascade
 """
-import os
+import json
+import random
+import asyncio
+import weakref
+import aiohttp
+import threading
 import requests
 import logging
 import time
-from typing import Dict, Any, Optional, List
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, AsyncIterator, Iterator, Optional, List, Tuple
 from langchain_core.language_models.llms import LLM
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+from langchain_core.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.outputs import GenerationChunk
 from pydantic import Extra, Field, root_validator
 
+try:
+    from bridge.metrics import client_latency
+    from bridge.transport import COMPRESSION_MIN_BYTES, encode_body, make_delta
+except ImportError:
+    # Running as a script from inside the bridge directory
+    from metrics import client_latency
+    from transport import COMPRESSION_MIN_BYTES, encode_body, make_delta
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -19,6 +34,205 @@ logging.basicConfig(
 
 logger = logging.getLogger('CascadeLLM')
 
+# Bridge responses worth retrying - the server is restarting or overloaded
+RETRY_STATUS_CODES = (502, 503, 504)
+
+# Seconds a bridge health result is trusted before the bridge is probed again
+HEALTH_CHECK_TTL = 60.0
+
+
+class BridgeError(RuntimeError):
+    """The bridge could not deliver a response."""
+
+
+class BridgeUnavailableError(BridgeError):
+    """The bridge server cannot be reached, or its circuit breaker is open."""
+
+
+class BridgeJobError(BridgeError):
+    """The bridge accepted a job but it was cancelled or failed."""
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast while the bridge is down.
+
+    After failure_threshold consecutive failures the circuit opens and calls are
+    rejected without touching the network. Once reset_timeout seconds have passed
+    a single trial call is let through; success closes the circuit again and
+    failure re-opens it.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """Return True if a call may be made now."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+    
+    def record_success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("Cascade Bridge is reachable again - closing circuit breaker")
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.error(f"Cascade Bridge failed {self.failures} times in a row - "
+                                 f"failing fast for {self.reset_timeout:.0f}s")
+                self.opened_at = time.monotonic()
+
+
+# One pooled HTTP session and circuit breaker per bridge URL, shared by every agent
+_sessions: Dict[str, requests.Session] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_bridge_session(bridge_url: str) -> requests.Session:
+    """Return the shared keep-alive HTTP session for a bridge."""
+    with _registry_lock:
+        if bridge_url not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[bridge_url] = session
+        return _sessions[bridge_url]
+
+
+def get_circuit_breaker(bridge_url: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> CircuitBreaker:
+    """Return the shared circuit breaker for a bridge."""
+    with _registry_lock:
+        if bridge_url not in _breakers:
+            _breakers[bridge_url] = CircuitBreaker(failure_threshold, reset_timeout)
+        return _breakers[bridge_url]
+
+
+# Last known health of each bridge URL: (healthy, time.monotonic() when observed)
+_health: Dict[str, Tuple[bool, float]] = {}
+
+# What each bridge advertised on /health: accepted encodings and prompt delta support
+_capabilities: Dict[str, Dict[str, Any]] = {}
+
+# Last prompt each role sent to each bridge, the base for the next prompt's delta
+_last_prompts: Dict[Tuple[str, str], str] = {}
+
+
+def bridge_capabilities(bridge_url: str) -> Dict[str, Any]:
+    """Return what a bridge advertised on /health, or {} if it has not been probed."""
+    return _capabilities.get(bridge_url, {})
+
+
+def _record_capabilities(bridge_url: str, status: Any) -> None:
+    if not isinstance(status, dict):
+        status = {}
+    _capabilities[bridge_url] = {
+        "encodings": tuple(status.get("encodings", ())),
+        "prompt_deltas": bool(status.get("prompt_deltas", False)),
+    }
+
+
+def _needs_probe(bridge_url: str, healthy: Optional[bool]) -> bool:
+    """Probe /health when the cached health is stale, or the bridge is up but its
+    capabilities were never read (every probe so far failed; successful requests
+    keep the health cache fresh without going through /health)."""
+    return healthy is None or (healthy and bridge_url not in _capabilities)
+
+
+def record_bridge_health(bridge_url: str, healthy: bool) -> None:
+    """Remember whether a bridge was reachable; every bridge request reports here."""
+    previous = _health.get(bridge_url)
+    _health[bridge_url] = (healthy, time.monotonic())
+    if previous is None or previous[0] != healthy:
+        if healthy:
+            logger.info(f"Cascade Bridge at {bridge_url} is reachable")
+        else:
+            logger.warning(f"Cascade Bridge at {bridge_url} is not reachable - is the bridge server running?")
+
+
+def bridge_health(bridge_url: str, ttl: float = HEALTH_CHECK_TTL) -> Optional[bool]:
+    """Return the cached health of a bridge, or None if unknown or older than ttl. Never does I/O."""
+    cached = _health.get(bridge_url)
+    if cached is None or time.monotonic() - cached[1] > ttl:
+        return None
+    return cached[0]
+
+
+def check_bridge_health(bridge_url: str, timeout: float = 5.0, ttl: float = HEALTH_CHECK_TTL) -> bool:
+    """Return whether a bridge is reachable, probing /health only if the cached result is stale
+    or the bridge's capabilities are still unknown."""
+    healthy = bridge_health(bridge_url, ttl)
+    if _needs_probe(bridge_url, healthy):
+        try:
+            response = get_bridge_session(bridge_url).get(f"{bridge_url}/health", timeout=timeout)
+            healthy = response.status_code == 200
+            if healthy:
+                _record_capabilities(bridge_url, response.json())
+        except (requests.exceptions.RequestException, ValueError):
+            healthy = False
+        record_bridge_health(bridge_url, healthy)
+    return healthy
+
+
+async def acheck_bridge_health(bridge_url: str, timeout: float = 5.0, ttl: float = HEALTH_CHECK_TTL) -> bool:
+    """Async version of check_bridge_health."""
+    healthy = bridge_health(bridge_url, ttl)
+    if _needs_probe(bridge_url, healthy):
+        try:
+            async with get_async_http_session().get(
+                f"{bridge_url}/health", timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                healthy = response.status == 200
+                if healthy:
+                    _record_capabilities(bridge_url, await response.json())
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            healthy = False
+        record_bridge_health(bridge_url, healthy)
+    return healthy
+
+
+# aiohttp sessions are bound to the event loop they were created on, so async
+# callers share one session per running loop
+_async_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_http_session() -> aiohttp.ClientSession:
+    """Return the shared aiohttp session for the running event loop."""
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=32))
+        _async_sessions[loop] = session
+    return session
+
+
+async def close_async_http_session() -> None:
+    """Close the shared aiohttp session of the running event loop, if any."""
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
 class CascadeLLM(LLM):
     """
     LLM wrapper for Cascade Bridge integration.
@@ -30,7 +244,17 @@ class CascadeLLM(LLM):
     
     bridge_url: str = Field(default="http://localhost:8089")
     agent_role: str = Field(default="Assistant")
-    timeout: int = Field(default=120)
+    kind: str = Field(default="generate")  # How the bridge shows the prompt: 'generate' or 'message' (customer tool)
+    timeout: int = Field(default=120)  # Timeout for each individual HTTP request
+    poll_wait: int = Field(default=30)  # Seconds each long-poll waits on the bridge
+    job_timeout: Optional[float] = Field(default=None)  # Give up on a human response after this long (None waits indefinitely)
+    streaming: bool = Field(default=False)
+    max_retries: int = Field(default=3)  # Retries for a failed HTTP request to the bridge
+    retry_backoff: float = Field(default=0.5)  # Base delay in seconds, doubled on each retry
+    retry_backoff_max: float = Field(default=8.0)
+    circuit_failure_threshold: int = Field(default=5)  # Consecutive failures before failing fast
+    circuit_reset_timeout: float = Field(default=30.0)  # Seconds to fail fast before trying again
+    compress_requests: bool = Field(default=True)  # Compress large prompts and send repeats as deltas
     
     class Config:
         """Configuration for this pydantic object."""
@@ -38,18 +262,16 @@ class CascadeLLM(LLM):
 
     @root_validator(skip_on_failure=True)
     def validate_environment(cls, values: Dict) -> Dict:
-        """Validate that bridge server appears to be running."""
-        try:
-            bridge_url = values["bridge_url"]
-            response = requests.get(f"{bridge_url}/health", timeout=5)
-            if response.status_code == 200:
-                logger.info(f"Successfully configured Cascade Bridge for role: {values['agent_role']}")
-            else:
-                logger.warning(f"Cascade Bridge health check failed: {response.status_code}")
-        except Exception as e:
-            logger.warning(f"Failed to connect to Cascade Bridge: {e}")
-            logger.warning("Bridge server might not be running - continuing with setup anyway")
+        """
+        Validate the configuration without touching the network.
         
+        Agents are built at import time, so the bridge is only probed on first
+        use (see check_bridge_health), and the result is shared process-wide.
+        """
+        if not values["bridge_url"].startswith(("http://", "https://")):
+            raise ValueError(f"bridge_url must be an http(s) URL, got {values['bridge_url']!r}")
+        values["bridge_url"] = values["bridge_url"].rstrip("/")
+        logger.info(f"Configured Cascade Bridge for role: {values['agent_role']}")
         return values
 
     @property
@@ -65,30 +287,390 @@ class CascadeLLM(LLM):
         **kwargs: Any,
     ) -> str:
         """Call the Cascade Bridge API."""
+        check_bridge_health(self.bridge_url)
+        if self.streaming:
+            return "".join(
+                chunk.text for chunk in self._stream(prompt, stop=stop, run_manager=run_manager, **kwargs)
+            )
+        
+        start, job_id = time.perf_counter(), None
         try:
-            # Prepare the payload
-            payload = {
-                "prompt": prompt,
-                "role": self.agent_role,
-                "stop": stop or [],
-            }
+            job_id = self._submit_job(prompt, stop)
+            response = self._wait_for_job(job_id)
+            self._record_latency(job_id, start, "ok")
+            return response
+                
+        except Exception as e:
+            # Surface the failure instead of handing the agent an error string as its answer
+            logger.error(f"Exception calling Cascade Bridge: {str(e)}")
+            self._record_latency(job_id, start, self._outcome(e))
+            raise
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        """Stream the response to a bridge job as server-sent events."""
+        start = time.perf_counter()
+        first_token = None
+        job_id = None
+        
+        try:
+            job_id = self._submit_job(prompt, stop)
+            try:
+                tokens = self._job_events(job_id)
+                for token in tokens:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                        logger.info(f"[{self.agent_role}] time to first token: {first_token - start:.2f}s")
+                    chunk = GenerationChunk(text=token)
+                    if run_manager:
+                        run_manager.on_llm_new_token(token, chunk=chunk)
+                    yield chunk
+            except requests.exceptions.RequestException as e:
+                if first_token is not None:
+                    raise
+                # The event stream dropped before the answer arrived - the job is still
+                # queued on the bridge, so collect it by long-polling instead
+                logger.warning(f"Event stream for job {job_id} failed, falling back to polling: {e}")
+                yield GenerationChunk(text=self._wait_for_job(job_id))
+            self._record_latency(job_id, start, "ok")
+                        
+        except Exception as e:
+            logger.error(f"Exception calling Cascade Bridge: {str(e)}")
+            self._record_latency(job_id, start, self._outcome(e))
+            raise
+
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Call the Cascade Bridge API without blocking a thread while the human answers."""
+        await acheck_bridge_health(self.bridge_url)
+        if self.streaming:
+            chunks = [chunk.text async for chunk in self._astream(prompt, stop=stop, run_manager=run_manager, **kwargs)]
+            return "".join(chunks)
+        
+        start, job_id = time.perf_counter(), None
+        try:
+            job_id = await self._asubmit_job(prompt, stop)
+            response = await self._await_job(job_id)
+            self._record_latency(job_id, start, "ok")
+            return response
+                
+        except Exception as e:
+            logger.error(f"Exception calling Cascade Bridge: {str(e)}")
+            self._record_latency(job_id, start, self._outcome(e))
+            raise
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        """Stream the response to a bridge job as server-sent events, asynchronously."""
+        start = time.perf_counter()
+        first_token = None
+        job_id = None
+        
+        try:
+            job_id = await self._asubmit_job(prompt, stop)
+            try:
+                async for token in self._ajob_events(job_id):
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                        logger.info(f"[{self.agent_role}] time to first token: {first_token - start:.2f}s")
+                    chunk = GenerationChunk(text=token)
+                    if run_manager:
+                        await run_manager.on_llm_new_token(token, chunk=chunk)
+                    yield chunk
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if first_token is not None:
+                    raise
+                logger.warning(f"Event stream for job {job_id} failed, falling back to polling: {e}")
+                yield GenerationChunk(text=await self._await_job(job_id))
+            self._record_latency(job_id, start, "ok")
+                        
+        except Exception as e:
+            logger.error(f"Exception calling Cascade Bridge: {str(e)}")
+            self._record_latency(job_id, start, self._outcome(e))
+            raise
+
+    @staticmethod
+    def _outcome(error: Exception) -> str:
+        if isinstance(error, TimeoutError):
+            return "timeout"
+        if isinstance(error, BridgeUnavailableError):
+            return "unavailable"
+        if isinstance(error, BridgeJobError):
+            return "failed"
+        return "error"
+
+    def _record_latency(self, job_id: Optional[str], start: float, outcome: str) -> None:
+        """Record client-side latency; the job id in the log line matches the bridge's job."""
+        elapsed = time.perf_counter() - start
+        client_latency.observe(elapsed, role=self.agent_role, outcome=outcome)
+        logger.info(f"[{self.agent_role}] bridge job {job_id or '-'} {outcome} after {elapsed:.2f}s")
+
+    def _breaker(self) -> CircuitBreaker:
+        return get_circuit_breaker(self.bridge_url, self.circuit_failure_threshold, self.circuit_reset_timeout)
+
+    def _circuit_open_error(self, breaker: CircuitBreaker) -> BridgeUnavailableError:
+        return BridgeUnavailableError(
+            f"Cascade Bridge at {self.bridge_url} is unavailable (circuit open after "
+            f"{breaker.failures} consecutive failures)"
+        )
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # Full jitter keeps agents that failed together from retrying in lockstep
+        return random.uniform(0, min(self.retry_backoff_max, self.retry_backoff * 2 ** attempt))
+
+    def _request(self, method: str, path: str, stream: bool = False, **kwargs: Any) -> requests.Response:
+        """
+        Send a request to the bridge on the shared session.
+        
+        Connection errors, timeouts and 502/503/504 responses are retried up to
+        max_retries times with jittered exponential backoff. While the circuit
+        breaker is open, requests fail immediately with BridgeUnavailableError.
+        """
+        breaker = self._breaker()
+        session = get_bridge_session(self.bridge_url)
+        url = f"{self.bridge_url}{path}"
+        
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow():
+                raise self._circuit_open_error(breaker)
+            try:
+                response = session.request(method, url, stream=stream, **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    breaker.record_success()
+                    record_bridge_health(self.bridge_url, True)
+                    return response
+                error: Exception = BridgeError(f"Bridge server error: {response.status_code} - {response.text}")
+                response.close()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            
+            breaker.record_failure()
+            if attempt == self.max_retries:
+                record_bridge_health(self.bridge_url, False)
+                break
+            delay = self._backoff_delay(attempt)
+            logger.warning(f"Bridge request {method} {path} failed ({error}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+        
+        raise BridgeUnavailableError(
+            f"Cascade Bridge request {method} {path} failed after {self.max_retries + 1} attempts: {error}"
+        ) from error
+
+    async def _arequest(self, method: str, path: str, **kwargs: Any) -> aiohttp.ClientResponse:
+        """
+        Send a request to the bridge on the shared async session.
+        
+        Same retry and circuit breaker behaviour as _request. The caller must
+        release the returned response, e.g. with ``async with``.
+        """
+        breaker = self._breaker()
+        session = get_async_http_session()
+        url = f"{self.bridge_url}{path}"
+        
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow():
+                raise self._circuit_open_error(breaker)
+            try:
+                response = await session.request(method, url, **kwargs)
+                if response.status not in RETRY_STATUS_CODES:
+                    breaker.record_success()
+                    record_bridge_health(self.bridge_url, True)
+                    return response
+                error: Exception = BridgeError(f"Bridge server error: {response.status} - {await response.text()}")
+                response.release()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = e
             
-            # Send request to bridge
-            response = requests.post(
-                f"{self.bridge_url}/generate", 
-                json=payload,
-                timeout=self.timeout
+            breaker.record_failure()
+            if attempt == self.max_retries:
+                record_bridge_health(self.bridge_url, False)
+                break
+            delay = self._backoff_delay(attempt)
+            logger.warning(f"Bridge request {method} {path} failed ({error!r}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        
+        raise BridgeUnavailableError(
+            f"Cascade Bridge request {method} {path} failed after {self.max_retries + 1} attempts: {error!r}"
+        ) from error
+
+    def _job_payload(self, prompt: str, stop: Optional[List[str]]) -> Dict[str, Any]:
+        return {
+            "prompt": prompt,
+            "role": self.agent_role,
+            "kind": self.kind,
+            "stop": stop or [],
+        }
+
+    @staticmethod
+    def _job_result(job_id: str, status: Dict[str, Any]) -> Optional[str]:
+        """Return a finished job's response, raise if it did not succeed, or None while pending."""
+        if status["status"] == "done":
+            return status.get("response", "")
+        if status["status"] == "cancelled":
+            raise BridgeJobError(f"Bridge job {job_id} was cancelled")
+        if status["status"] == "failed":
+            raise BridgeJobError(f"Bridge job {job_id} failed: {status.get('error')}")
+        return None
+
+    @staticmethod
+    def _parse_event(job_id: str, event: str, data: List[str]) -> Tuple[Optional[str], bool]:
+        """Interpret one server-sent event as (token, finished)."""
+        payload = json.loads("\n".join(data)) if data else {}
+        if event == "token":
+            return payload.get("token", ""), False
+        if event in ("cancelled", "failed"):
+            CascadeLLM._job_result(job_id, payload or {"status": event})
+        return None, event == "done"
+
+    def _encode_job(self, prompt: str, stop: Optional[List[str]], use_delta: bool = True) -> Tuple[bytes, Dict[str, str]]:
+        """
+        Build the request body for a job.
+        
+        If the bridge supports it, a large prompt that mostly repeats this role's
+        previous prompt is sent as a delta against it, and the body is compressed.
+        """
+        payload = self._job_payload(prompt, stop)
+        if not self.compress_requests:
+            return encode_body(payload, encodings=())
+        
+        capabilities = bridge_capabilities(self.bridge_url)
+        previous = _last_prompts.get((self.bridge_url, self.agent_role))
+        if (use_delta and previous is not None and capabilities.get("prompt_deltas")
+                and len(prompt) >= COMPRESSION_MIN_BYTES):
+            delta = make_delta(previous, prompt)
+            if delta is not None:
+                del payload["prompt"]
+                payload["prompt_delta"] = delta
+        return encode_body(payload, capabilities.get("encodings", ()))
+
+    def _submit_job(self, prompt: str, stop: Optional[List[str]]) -> str:
+        """Submit a prompt to the bridge and return the job id."""
+        body, headers = self._encode_job(prompt, stop)
+        # A retried submission whose first attempt did reach the bridge attaches to
+        # the same job, because the bridge deduplicates identical pending prompts
+        response = self._request("POST", "/jobs", data=body, headers=headers, timeout=self.timeout)
+        if response.status_code == 409:
+            # The bridge no longer has the delta's base prompt - send it in full
+            body, headers = self._encode_job(prompt, stop, use_delta=False)
+            response = self._request("POST", "/jobs", data=body, headers=headers, timeout=self.timeout)
+        if response.status_code != 202:
+            raise BridgeError(f"Bridge server error: {response.status_code} - {response.text}")
+        _last_prompts[(self.bridge_url, self.agent_role)] = prompt
+        return response.json()["job_id"]
+
+    def _wait_for_job(self, job_id: str) -> str:
+        """Long-poll the bridge until a job has finished and return its response."""
+        deadline = time.monotonic() + self.job_timeout if self.job_timeout else None
+        while True:
+            response = self._request(
+                "GET",
+                f"/jobs/{job_id}",
+                params={"wait": self.poll_wait},
+                timeout=self.poll_wait + self.timeout
             )
+            if response.status_code != 200:
+                raise BridgeError(f"Bridge server error: {response.status_code} - {response.text}")
             
-            if response.status_code == 200:
-                result = response.json()
-                return result.get("response", "")
-            else:
-                error_message = f"Bridge server error: {response.status_code} - {response.text}"
-                logger.error(error_message)
-                return f"[ERROR: {error_message}]"
-                
-        except Exception as e:
-            error_message = f"Exception calling Cascade Bridge: {str(e)}"
-            logger.error(error_message)
-            return f"[ERROR: {error_message}]"
+            result = self._job_result(job_id, response.json())
+            if result is not None:
+                return result
+            if deadline is not None and time.monotonic() > deadline:
+                self._request("DELETE", f"/jobs/{job_id}", timeout=self.timeout)
+                raise TimeoutError(f"No response to bridge job {job_id} after {self.job_timeout}s")
+
+    def _job_events(self, job_id: str) -> Iterator[str]:
+        """Yield response tokens for a job from the bridge's server-sent event stream."""
+        with self._request(
+            "GET",
+            f"/jobs/{job_id}/events",
+            stream=True,
+            # The bridge sends keep-alives while the human is typing, so only the
+            # gap between events is bounded, not the total wait
+            timeout=(self.timeout, self.poll_wait + self.timeout)
+        ) as response:
+            if response.status_code != 200:
+                raise BridgeError(f"Bridge server error: {response.status_code} - {response.text}")
+            
+            event, data = None, []
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data.append(line[len("data:"):].strip())
+                elif not line and event:
+                    # Blank line ends an event
+                    token, finished = self._parse_event(job_id, event, data)
+                    if token is not None:
+                        yield token
+                    if finished:
+                        return
+                    event, data = None, []
+
+    async def _asubmit_job(self, prompt: str, stop: Optional[List[str]]) -> str:
+        """Submit a prompt to the bridge and return the job id, asynchronously."""
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        for use_delta in (True, False):
+            body, headers = self._encode_job(prompt, stop, use_delta)
+            async with await self._arequest("POST", "/jobs", data=body, headers=headers, timeout=timeout) as response:
+                if response.status == 409 and use_delta:
+                    # The bridge no longer has the delta's base prompt - send it in full
+                    continue
+                if response.status != 202:
+                    raise BridgeError(f"Bridge server error: {response.status} - {await response.text()}")
+                _last_prompts[(self.bridge_url, self.agent_role)] = prompt
+                return (await response.json())["job_id"]
+
+    async def _await_job(self, job_id: str) -> str:
+        """Long-poll the bridge until a job has finished, without blocking a thread."""
+        deadline = time.monotonic() + self.job_timeout if self.job_timeout else None
+        timeout = aiohttp.ClientTimeout(total=self.poll_wait + self.timeout)
+        while True:
+            async with await self._arequest(
+                "GET", f"/jobs/{job_id}", params={"wait": str(self.poll_wait)}, timeout=timeout
+            ) as response:
+                if response.status != 200:
+                    raise BridgeError(f"Bridge server error: {response.status} - {await response.text()}")
+                result = self._job_result(job_id, await response.json())
+            if result is not None:
+                return result
+            if deadline is not None and time.monotonic() > deadline:
+                cancel = await self._arequest("DELETE", f"/jobs/{job_id}", timeout=aiohttp.ClientTimeout(total=self.timeout))
+                cancel.release()
+                raise TimeoutError(f"No response to bridge job {job_id} after {self.job_timeout}s")
+
+    async def _ajob_events(self, job_id: str) -> AsyncIterator[str]:
+        """Yield response tokens for a job from the bridge's server-sent event stream, asynchronously."""
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.poll_wait + self.timeout)
+        async with await self._arequest("GET", f"/jobs/{job_id}/events", timeout=timeout) as response:
+            if response.status != 200:
+                raise BridgeError(f"Bridge server error: {response.status} - {await response.text()}")
+            
+            event, data = None, []
+            async for raw_line in response.content:
+                line = raw_line.decode('utf-8').rstrip("\r\n")
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data.append(line[len("data:"):].strip())
+                elif not line and event:
+                    token, finished = self._parse_event(job_id, event, data)
+                    if token is not None:
+                        yield token
+                    if finished:
+                        return
+                    event, data = None, []
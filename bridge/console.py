@@ -0,0 +1,160 @@
+"""
+Console operator for the bridge
+
+Shows queued agent prompts to the human and delivers the answers. When several
+agents are waiting at the same time, their questions are combined into one
+numbered prompt and the reply is split back into one answer per agent, so a
+single human turn unblocks all of them.
+"""
+import re
+import asyncio
+import logging
+
+logger = logging.getLogger('CascadeBridge')
+
+# Matches the start of a numbered answer: "1:", "1)", "1." or "[1]"
+_ANSWER_START = re.compile(r"^\s*(?:\[(\d+)\]|(\d+)\s*[:).])\s?(.*)$")
+
+
+def parse_numbered_reply(text, count):
+    """
+    Split a reply to a numbered prompt into one answer per question
+
+    Lines starting with a number ("1: ...", "2) ...", "[3] ...") begin the answer
+    to that question, and following lines continue it. A reply starting with
+    "all:" answers every question with the same text.
+
+    Args:
+        text: The human's reply
+        count: Number of questions in the prompt
+
+    Returns:
+        Dictionary of question number (1-based) to answer
+    """
+    stripped = text.strip()
+    if stripped.lower().startswith("all:"):
+        answer = stripped[len("all:"):].strip()
+        return {number: answer for number in range(1, count + 1)}
+
+    answers = {}
+    current = None
+    for line in text.splitlines():
+        match = _ANSWER_START.match(line)
+        if match and 0 < int(match.group(1) or match.group(2)) <= count:
+            current = int(match.group(1) or match.group(2))
+            answers[current] = [match.group(3)]
+        elif current is not None:
+            answers[current].append(line)
+    return {number: "\n".join(lines).strip() for number, lines in answers.items()}
+
+
+def use_suggestion(answer, suggestions):
+    """Replace a '!<n>' answer with the n-th suggested answer"""
+    choice = answer.strip()
+    if choice.startswith("!") and choice[1:].isdigit() and 0 < int(choice[1:]) <= len(suggestions):
+        answer = suggestions[int(choice[1:]) - 1][1]['answer']
+        print(f"Using suggested answer: {answer[:100]}")
+    return answer
+
+
+def show_suggestions(suggestions, indent=""):
+    if suggestions:
+        print(f"{indent}Suggested answers from earlier questions (type !<number> to use one):")
+        for number, (score, entry) in enumerate(suggestions, 1):
+            print(f"{indent}  !{number} [{score:.2f}] {entry['answer'][:100]}")
+
+
+def read_multiline(prompt="> "):
+    """Read lines until an empty line"""
+    lines = []
+    while True:
+        line = input(prompt)
+        if not line.strip():
+            return "\n".join(lines)
+        lines.append(line)
+
+
+def deliver(pending, answer, memory):
+    if pending.done:
+        print(f"(The {pending.role} request stopped waiting for this response)")
+    pending.resolve(answer)
+    if memory:
+        memory.record(pending.role, pending.prompt, answer, pending.kind)
+
+
+async def console_operator(session, memory=None, batch_window=0.5, max_batch=5):
+    """
+    Show queued prompts to the human and deliver the answers
+
+    Prompts are answered in arrival order, so concurrent agents never
+    interleave their messages on the console. Prompts that arrive within
+    batch_window seconds of each other, or while the human is busy, are
+    asked together as one numbered prompt of up to max_batch questions.
+
+    Args:
+        session: BridgeSession to take prompts from
+        memory: Optional AnswerMemory for suggestions; answers to direct questions are stored in it
+        batch_window: Seconds to wait for more prompts before asking
+        max_batch: Maximum number of questions in one combined prompt
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await session.next_prompt()]
+        if batch_window and max_batch > 1:
+            await asyncio.sleep(batch_window)
+        batch += session.take_pending(max_batch - 1)
+        batch = [pending for pending in batch if not pending.done]
+        if not batch:
+            continue
+        waiting = len(session)
+
+        if len(batch) == 1:
+            pending = batch[0]
+
+            # Display agent's message to human
+            print(f"\n\n{'=' * 40}")
+            print(f"Message from {pending.role}:" + (f" ({waiting} more waiting)" if waiting else ""))
+            if pending.waiters > 1:
+                print(f"(Asked {pending.waiters} times - one answer goes to every request)")
+            print(f"{'=' * 40}")
+            print(pending.prompt)
+            print(f"{'=' * 40}")
+
+            # Offer answers given to similar questions before
+            suggestions = memory.search(pending.prompt) if memory else []
+            show_suggestions(suggestions)
+
+            # Get human's response without blocking the event loop
+            print("\nYour response (type your answer and press Enter):")
+            human_response = await loop.run_in_executor(None, input, "> ")
+            deliver(pending, use_suggestion(human_response, suggestions), memory)
+            continue
+
+        # Several agents are waiting - ask all of them in one numbered prompt
+        print(f"\n\n{'=' * 40}")
+        print(f"{len(batch)} agents are waiting for you" + (f" ({waiting} more queued)" if waiting else ""))
+        print(f"{'=' * 40}")
+        all_suggestions = []
+        for number, pending in enumerate(batch, 1):
+            print(f"\n[{number}] Message from {pending.role}:")
+            print(pending.prompt)
+            suggestions = memory.search(pending.prompt) if memory else []
+            show_suggestions(suggestions, indent="    ")
+            all_suggestions.append(suggestions)
+        print(f"{'=' * 40}")
+        print("\nAnswer each question on its own line starting with its number (e.g. '1: yes'),")
+        print("or 'all: <answer>' to answer every question. Finish with an empty line:")
+        reply = await loop.run_in_executor(None, read_multiline)
+
+        answers = parse_numbered_reply(reply, len(batch))
+        unanswered = []
+        for number, pending in enumerate(batch, 1):
+            if number in answers:
+                deliver(pending, use_suggestion(answers[number], all_suggestions[number - 1]), memory)
+            else:
+                unanswered.append(pending)
+
+        if unanswered:
+            # Ask again next turn rather than guessing
+            print(f"No answer found for {len(unanswered)} question(s) - they will be asked again")
+            session.requeue(unanswered)
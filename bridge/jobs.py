@@ -0,0 +1,223 @@
+"""
+Job store for bridge generations
+
+Instead of holding one HTTP request open while a human types, clients submit a
+prompt as a job, get an id back, and then long-poll or subscribe to server-sent
+events for the result. Finished jobs are kept for a while so a client that
+reconnects can still collect its answer.
+
+Retries and re-delegation often send the same prompt again. An identical prompt
+from the same role that is still pending attaches to the existing job, and one
+answered within the last few minutes is served from a short-lived cache, so the
+human is only asked once.
+"""
+import time
+import asyncio
+import hashlib
+import logging
+
+try:
+    from bridge.session import PendingPrompt
+except ImportError:
+    # Running as a script from inside the bridge directory
+    from session import PendingPrompt
+
+logger = logging.getLogger('CascadeBridge')
+
+
+class JobStore:
+    """Tracks submitted prompts by id until their results have expired"""
+
+    def __init__(self, session, result_ttl=600, answer_ttl=120, memory=None, recorder=None, replayer=None,
+                 router=None, abandon_ttl=180):
+        """
+        Args:
+            session: BridgeSession that jobs are queued on
+            result_ttl: Seconds a finished job's result stays available
+            answer_ttl: Seconds an answer is reused for an identical prompt from the same role
+            memory: Optional AnswerMemory used to auto-reply to recurring questions
+            recorder: Optional TranscriptRecorder that every answered job is written to
+            replayer: Optional TranscriptReplayer that answers jobs from a recorded transcript
+            router: Optional OperatorRouter that picks the session by role instead
+            abandon_ttl: Seconds a polled job stays pending after its client last asked for it
+        """
+        self.session = session
+        self.router = router
+        self.memory = memory
+        self.recorder = recorder
+        self.replayer = replayer
+        self.result_ttl = result_ttl
+        self.answer_ttl = answer_ttl
+        self.abandon_ttl = abandon_ttl
+        self._jobs = {}
+        self._finished = {}
+        self._by_prompt = {}  # (kind, role, prompt hash) -> latest job for that prompt
+        self.metrics = None  # Optional BridgeMetrics, set by the server
+        self.attached = 0
+        self.cache_hits = 0
+
+    @staticmethod
+    def _prompt_key(role, prompt, kind):
+        return (kind, role, hashlib.sha256(prompt.encode('utf-8')).hexdigest())
+
+    def submit(self, role, prompt, kind="generate"):
+        """
+        Queue a prompt for the human and return its job
+
+        Returns:
+            Tuple of (job, source) where source is 'new', 'attached' for an
+            identical prompt that is still pending, 'cached' for one
+            answered within answer_ttl, 'auto' for an answer from memory,
+            or 'replay' for an answer from a recorded transcript
+        """
+        job, source = self._submit(role, prompt, kind)
+        if self.metrics is not None:
+            self.metrics.jobs_total.inc(kind=kind, source=source)
+        return job, source
+
+    def _submit(self, role, prompt, kind):
+        self.expire()
+        key = self._prompt_key(role, prompt, kind)
+        existing = self._by_prompt.get(key)
+        if existing is not None:
+            if not existing.done:
+                existing.waiters += 1
+                self.attached += 1
+                logger.info(f"{role} repeated a pending prompt - attached to job {existing.id[:8]}")
+                return existing, 'attached'
+            finished = self._finished.get(existing.id)
+            if (not existing.future.cancelled() and existing.future.exception() is None
+                    and finished is not None
+                    and time.time() - finished <= self.answer_ttl):
+                self.cache_hits += 1
+                print(f"\n[cache] Answered a repeated prompt from {role} with your response "
+                      f"from {time.time() - finished:.0f}s ago", flush=True)
+                return existing, 'cached'
+
+        job = PendingPrompt(role, prompt, kind)
+        self._jobs[job.id] = job
+        self._by_prompt[key] = job
+        job.future.add_done_callback(lambda _: self._finished.setdefault(job.id, time.time()))
+        if self.recorder is not None:
+            job.future.add_done_callback(lambda _: self._record(job))
+        if self.metrics is not None:
+            job.future.add_done_callback(lambda _: self.metrics.job_answered(job))
+
+        # Answer from the recorded transcript when replaying a run
+        if self.replayer is not None:
+            response, how = self.replayer.lookup(role, prompt, kind)
+            if response is not None:
+                logger.info(f"Replayed response for {role} ({how})")
+                job.source = 'replay'
+                job.resolve(response)
+                return job, 'replay'
+            if how == 'fail':
+                logger.error(f"No recorded response for a prompt from {role} - failing the job")
+                job.fail(f"No recorded response for this prompt from {role} in {self.replayer.path}")
+                return job, 'replay'
+
+        # Answer recurring questions from memory when the auto-reply policy allows it
+        match = self.memory.find_auto_reply(kind, prompt) if self.memory else None
+        if match is not None:
+            score, entry = match
+            print(f"\n[auto-reply] Answered {role} from memory (similarity {score:.2f}): "
+                  f"{entry['answer'][:80]}", flush=True)
+            job.source = 'auto'
+            job.resolve(entry['answer'])
+            return job, 'auto'
+
+        session = self.router.session_for(role) if self.router is not None else self.session
+        job.operator = session.name
+        session.submit(job)
+        return job, 'new'
+
+    def _record(self, job):
+        if job.future.cancelled() or job.future.exception() is not None:
+            return
+        try:
+            self.recorder.record(job, job.future.result(), job.source)
+        except OSError as e:
+            logger.error(f"Could not write transcript entry: {str(e)}")
+
+    def release(self, job):
+        """
+        Stop waiting on a job for one request
+
+        The job is cancelled once no request is waiting on it any more.
+        """
+        job.waiters -= 1
+        if job.waiters <= 0:
+            job.cancel()
+
+    def in_flight(self):
+        """Number of jobs still waiting for an answer"""
+        return sum(1 for job in self._jobs.values() if not job.done)
+
+    def get(self, job_id):
+        """Look up a job by id, or None if it is unknown or expired"""
+        return self._jobs.get(job_id)
+
+    @staticmethod
+    def touch(job):
+        """Note that a polling client is still interested in a job"""
+        job.last_seen = time.time()
+
+    def abandoned(self, endpoint, reason):
+        """Count a prompt given up on before it was answered"""
+        if self.metrics is not None:
+            self.metrics.abandoned.inc(endpoint=endpoint, reason=reason)
+
+    def cancel(self, job_id):
+        """Release a job that one client no longer wants"""
+        job = self._jobs.get(job_id)
+        if job is not None and not job.done:
+            self.release(job)
+            self.abandoned("/jobs", "cancelled")
+        return job
+
+    def expire(self):
+        """Release polled jobs nobody has asked about for abandon_ttl, and forget finished jobs older than result_ttl"""
+        stale = time.time() - self.abandon_ttl
+        for job in list(self._jobs.values()):
+            if not job.done and job.last_seen is not None and job.last_seen < stale:
+                logger.warning(f"No client has polled job {job.id[:8]} from {job.role} for "
+                               f"{self.abandon_ttl}s - releasing it")
+                job.last_seen = None
+                self.release(job)
+                self.abandoned("/jobs", "expired")
+
+        cutoff = time.time() - self.result_ttl
+        for job_id in [j for j, finished in self._finished.items() if finished < cutoff]:
+            self._finished.pop(job_id, None)
+            job = self._jobs.pop(job_id, None)
+            if job is not None:
+                key = self._prompt_key(job.role, job.prompt, job.kind)
+                if self._by_prompt.get(key) is job:
+                    del self._by_prompt[key]
+
+    @staticmethod
+    def describe(job):
+        """JSON-serialisable status of a job"""
+        if not job.done:
+            return {"job_id": job.id, "status": "pending", "role": job.role}
+        if job.future.cancelled():
+            return {"job_id": job.id, "status": "cancelled", "role": job.role}
+        if job.future.exception() is not None:
+            return {"job_id": job.id, "status": "failed", "role": job.role,
+                    "error": str(job.future.exception())}
+        return {"job_id": job.id, "status": "done", "role": job.role,
+                "response": job.future.result()}
+
+    @staticmethod
+    async def wait(job, timeout):
+        """Wait up to timeout seconds for a job without cancelling it on timeout"""
+        if job.done:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(job.future), timeout)
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            if not job.future.cancelled():
+                raise
+        return True
@@ -0,0 +1,242 @@
+"""
+Metrics for the bridge
+
+A small in-process registry of counters, gauges and histograms rendered in the
+Prometheus text exposition format, so the bridge can serve /metrics without an
+extra dependency. CascadeLLM records its client-side latency in the same format,
+served by the crew process itself via serve_client_metrics.
+"""
+import math
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds - humans answer in seconds to hours
+LATENCY_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+# Bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class for a named metric with optional labels"""
+
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self):
+        """Yield (suffix, label values, extra labels, value) tuples"""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, values, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.label_names, values, extra)} "
+                         f"{_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = defaultdict(float)
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            self._values[self._key(labels)] += amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield "", key, (), value
+
+
+class Gauge(Metric):
+    """Gauge whose values are computed by a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), callback=None):
+        super().__init__(name, help_text, labels)
+        self.callback = callback
+
+    def samples(self):
+        values = self.callback() if self.callback else {}
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            yield "", key if isinstance(key, tuple) else (key,), (), value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts = {}
+        self._sums = defaultdict(float)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._sums[key] += value
+
+    def samples(self):
+        with self._lock:
+            counts = {key: list(values) for key, values in self._counts.items()}
+            sums = dict(self._sums)
+        for key in sorted(counts):
+            for bound, count in zip(self.buckets, counts[key]):
+                yield "_bucket", key, (("le", _format_value(bound)),), count
+            yield "_sum", key, (), sums[key]
+            yield "_count", key, (), counts[key][-1]
+
+
+class MetricsRegistry:
+    """A set of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=(), callback=None):
+        return self.register(Gauge(name, help_text, labels, callback))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def render(self):
+        """Prometheus text exposition of every metric"""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+class BridgeMetrics:
+    """The metrics the bridge server exposes on /metrics"""
+
+    def __init__(self, router, jobs):
+        """
+        Args:
+            router: OperatorRouter whose operator queues are reported
+            jobs: JobStore whose in-flight jobs are reported
+        """
+        self.registry = MetricsRegistry()
+        self.queue_depth = self.registry.gauge(
+            "bridge_queue_depth", "Prompts waiting for an operator, by operator and asking role",
+            ("operator", "role"), callback=lambda: self._queue_depths(router.sessions))
+        self.in_flight = self.registry.gauge(
+            "bridge_jobs_in_flight", "Jobs submitted but not yet answered",
+            callback=lambda: jobs.in_flight())
+        self.jobs_total = self.registry.counter(
+            "bridge_jobs_total", "Jobs submitted, by kind and how they were answered", ("kind", "source"))
+        self.human_latency = self.registry.histogram(
+            "bridge_human_response_seconds", "Time from a prompt being queued to the human answering it",
+            ("role", "kind"))
+        self.payload_bytes = self.registry.histogram(
+            "bridge_request_payload_bytes", "Size of request bodies received", ("endpoint",),
+            buckets=SIZE_BUCKETS)
+        self.response_bytes = self.registry.histogram(
+            "bridge_response_bytes", "Size of answers delivered to agents", ("kind",),
+            buckets=SIZE_BUCKETS)
+        self.abandoned = self.registry.counter(
+            "bridge_abandoned_requests_total",
+            "Prompts given up on before an answer, by reason: the waiting client disconnected, "
+            "cancelled the job (client-side timeout) or stopped polling until the job expired",
+            ("endpoint", "reason"))
+
+    @staticmethod
+    def _queue_depths(sessions):
+        counts = defaultdict(int)
+        for name, session in sessions.items():
+            for pending in session.pending():
+                counts[(name, pending.role)] += 1
+        return dict(counts)
+
+    def job_answered(self, job):
+        """Record a finished job"""
+        if job.future.cancelled() or job.future.exception() is not None:
+            return
+        response = job.future.result()
+        self.response_bytes.observe(len(response.encode('utf-8')), kind=job.kind)
+        if job.source == "human":
+            self.human_latency.observe(job.answered - job.created, role=job.role, kind=job.kind)
+
+    def render(self):
+        return self.registry.render()
+
+
+# Client-side latency recorded by CascadeLLM, labelled by agent role so it can be
+# lined up with bridge_human_response_seconds
+client_registry = MetricsRegistry()
+client_latency = client_registry.histogram(
+    "cascade_client_latency_seconds", "Time from CascadeLLM submitting a prompt to receiving the answer",
+    ("role", "outcome"))
+
+
+def serve_client_metrics(port, host="127.0.0.1"):
+    """Serve the client-side metrics on /metrics from a background thread
+
+    The bridge's own /metrics only sees the server side, so the crew process
+    exposes cascade_client_latency_seconds for the same scraper.
+
+    Args:
+        port: Port to listen on, 0 for any free port
+        host: Interface to bind
+
+    Returns:
+        The running server; server.server_address holds the bound port and
+        server.shutdown() stops it
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = client_registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="client-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,88 @@
+"""
+Remote operator console for the bridge
+
+Lets a second (or third) person answer agent prompts from their own terminal.
+The bridge routes prompts to operators by agent role (see run_bridge.py
+--route), and this client pulls the prompts for one operator and sends back
+the answers, so independent questions are answered in parallel.
+
+Usage:
+    python bridge/remote_operator.py --name alice --bridge http://localhost:8089
+"""
+import time
+import logging
+import argparse
+
+import requests
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger('RemoteOperator')
+
+POLL_WAIT = 30
+
+
+def run_operator(name, bridge_url):
+    """Answer the prompts routed to operator name until interrupted"""
+    session = requests.Session()
+    next_url = f"{bridge_url}/operators/{name}/next"
+    answer_url = f"{bridge_url}/operators/{name}/answer"
+    print(f"Answering prompts for operator '{name}' from {bridge_url} (Ctrl+C to stop)")
+
+    while True:
+        try:
+            response = session.get(next_url, params={"wait": POLL_WAIT}, timeout=POLL_WAIT + 10)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Bridge unreachable ({e}), retrying in 5s")
+            time.sleep(5)
+            continue
+        if response.status_code == 204:
+            continue
+        if response.status_code != 200:
+            logger.error(f"Bridge error: {response.status_code} - {response.text}")
+            time.sleep(5)
+            continue
+
+        prompt = response.json()
+        waiting = prompt.get("waiting", 0)
+        print(f"\n\n{'=' * 40}")
+        print(f"Message from {prompt['role']}:" + (f" ({waiting} more waiting)" if waiting else ""))
+        print(f"{'=' * 40}")
+        print(prompt['prompt'])
+        print(f"{'=' * 40}")
+
+        suggestions = prompt.get("suggestions", [])
+        if suggestions:
+            print("Suggested answers from earlier questions (type !<number> to use one):")
+            for number, suggestion in enumerate(suggestions, 1):
+                print(f"  !{number} [{suggestion['score']:.2f}] {suggestion['answer'][:100]}")
+
+        print("\nYour response (type your answer and press Enter):")
+        answer = input("> ")
+        choice = answer.strip()
+        if choice.startswith("!") and choice[1:].isdigit() and 0 < int(choice[1:]) <= len(suggestions):
+            answer = suggestions[int(choice[1:]) - 1]['answer']
+            print(f"Using suggested answer: {answer[:100]}")
+
+        result = session.post(answer_url, json={"job_id": prompt['job_id'], "lease": prompt['lease'],
+                                                "response": answer}, timeout=30)
+        if result.status_code == 409:
+            print("(Not delivered - the prompt was already answered, the agent stopped waiting, "
+                  "or your lease ran out and it was queued again)")
+        elif result.status_code != 200:
+            logger.error(f"Could not deliver answer: {result.status_code} - {result.text}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Answer CrewSurf bridge prompts as a remote operator")
+    parser.add_argument('--name', required=True, help="Operator name used in the bridge's --route rules")
+    parser.add_argument('--bridge', default='http://localhost:8089', help="Bridge server URL")
+    args = parser.parse_args()
+
+    try:
+        run_operator(args.name, args.bridge.rstrip('/'))
+    except KeyboardInterrupt:
+        print("\nStopped")
@@ -0,0 +1,77 @@
+"""
+Operator routing for the bridge
+
+Several people can answer agent prompts at once. Each operator has their own
+BridgeSession queue, and routing rules send prompts to an operator by the role
+of the asking agent, e.g. architecture questions to one person and customer
+questions to another. Prompts that match no rule go to the default operator,
+the console of the bridge process.
+"""
+import logging
+from fnmatch import fnmatchcase
+
+try:
+    from bridge.session import BridgeSession
+except ImportError:
+    # Running as a script from inside the bridge directory
+    from session import BridgeSession
+
+logger = logging.getLogger('CascadeBridge')
+
+
+class OperatorRouter:
+    """Maps agent roles to operator sessions"""
+
+    def __init__(self, default_session=None):
+        """
+        Args:
+            default_session: Session for prompts no rule matches, a new console session by default
+        """
+        self.default = default_session or BridgeSession()
+        self.sessions = {self.default.name: self.default}
+        self.rules = []
+
+    def add_rule(self, pattern, operator):
+        """
+        Send prompts from roles matching pattern to operator
+
+        Args:
+            pattern: Case-insensitive glob over the agent role, e.g. '*Architect*'
+            operator: Operator name; its session is created on first use
+        """
+        if operator not in self.sessions:
+            self.sessions[operator] = BridgeSession(operator)
+        self.rules.append((pattern.lower(), operator))
+        logger.info(f"Routing prompts from roles matching '{pattern}' to operator {operator}")
+
+    @classmethod
+    def from_specs(cls, specs, default_session=None):
+        """Build a router from 'PATTERN=OPERATOR' strings"""
+        router = cls(default_session)
+        for spec in specs or ():
+            pattern, separator, operator = spec.rpartition("=")
+            if not separator or not pattern or not operator:
+                raise ValueError(f"Routing rule must look like PATTERN=OPERATOR, got '{spec}'")
+            router.add_rule(pattern.strip(), operator.strip())
+        return router
+
+    def session_for(self, role):
+        """Return the session of the operator responsible for a role; the first matching rule wins"""
+        for pattern, operator in self.rules:
+            if fnmatchcase(role.lower(), pattern):
+                return self.sessions[operator]
+        return self.default
+
+    def get(self, operator):
+        return self.sessions.get(operator)
+
+    def is_remote(self, operator):
+        """Whether operator is answered through the operator API; the default
+        operator is answered at the bridge's own console"""
+        return operator in self.sessions and self.sessions[operator] is not self.default
+
+    def describe(self):
+        """JSON-serialisable summary of the operators and their queues"""
+        return [{"operator": name, "waiting": len(session),
+                 "roles": [pattern for pattern, op in self.rules if op == name] or (["*"] if session is self.default else [])}
+                for name, session in self.sessions.items()]
@@ -1,11 +1,36 @@
 """
 Simple Bridge Server for Cascade/Windsurf Integration
 This allows CrewAI agents to communicate with humans through the Windsurf IDE
+
+The server is asyncio-based: every agent request waits on a future while the
+human answers queued prompts one at a time on the console, so any number of
+agents can be waiting at once without tying up worker threads. With --route
+rules, prompts from some roles go to remote operators (bridge/remote_operator.py)
+who answer them in parallel with the console.
 """
-import os
 import json
-from flask import Flask, request, jsonify, Response
+import asyncio
 import logging
+import argparse
+from aiohttp import web, compression_utils
+
+try:
+    from bridge.jobs import JobStore
+    from bridge.answer_memory import AnswerMemory
+    from bridge.console import console_operator
+    from bridge.transcript import TranscriptRecorder, TranscriptReplayer, REPLAY_FALLBACKS
+    from bridge.metrics import BridgeMetrics
+    from bridge.routing import OperatorRouter
+    from bridge.transport import COMPRESSION_MIN_BYTES, PromptCache, UnknownDeltaBase, decode_payload
+except ImportError:
+    # Running as a script from inside the bridge directory
+    from jobs import JobStore
+    from answer_memory import AnswerMemory
+    from console import console_operator
+    from transcript import TranscriptRecorder, TranscriptReplayer, REPLAY_FALLBACKS
+    from metrics import BridgeMetrics
+    from routing import OperatorRouter
+    from transport import COMPRESSION_MIN_BYTES, PromptCache, UnknownDeltaBase, decode_payload
 
 # Configure logging
 logging.basicConfig(
@@ -15,50 +40,443 @@ logging.basicConfig(
 
 logger = logging.getLogger('CascadeBridge')
 
-# Initialize Flask app
-app = Flask(__name__)
+# Longest a single long-poll request may wait, and the SSE keep-alive interval
+MAX_POLL_WAIT = 60
+SSE_KEEPALIVE = 15
+
+# How often jobs whose polling client went away are looked for
+JOB_SWEEP_INTERVAL = 30
+
+# Seconds a remote operator has to answer a prompt before it is queued again
+OPERATOR_LEASE = 900
+
+# Kinds of prompt a job can be: an agent's LLM call, or a customer-tool message
+JOB_KINDS = ("generate", "message")
+
+# Cancel handlers when their client disconnects, so an agent that gave up is not
+# left in the operator's queue (aiohttp stopped doing this by default in 3.9)
+SERVER_OPTIONS = {"handler_cancellation": True}
+
+# Request Content-Encodings aiohttp decompresses for us
+ACCEPTED_ENCODINGS = ("zstd", "gzip") if getattr(compression_utils, 'HAS_ZSTD', False) else ("gzip",)
+
+
+async def health_check(request):
+    """Health check endpoint, also advertising the request encodings the bridge accepts"""
+    return web.json_response({
+        "status": "ok",
+        "encodings": list(ACCEPTED_ENCODINGS),
+        "prompt_deltas": True,
+    })
+
+
+async def read_payload(request, field="prompt"):
+    """
+    Read a JSON request body that may carry a delta for field
+
+    Compressed bodies have already been decompressed by aiohttp.
+
+    Raises:
+        web.HTTPConflict: A delta refers to a prompt the bridge no longer has,
+            so the client should resend the full text
+    """
+    try:
+        return decode_payload(await request.read(), request.app['prompts'], field)
+    except UnknownDeltaBase:
+        raise web.HTTPConflict(text=json.dumps({"error": "Unknown delta base"}),
+                               content_type='application/json')
+
+
+async def metrics(request):
+    """Queue, latency and payload metrics in Prometheus text format"""
+    return web.Response(text=request.app['metrics'].render(),
+                        content_type='text/plain', charset='utf-8',
+                        headers={'X-Prometheus-Format': '0.0.4'})
+
+
+@web.middleware
+async def payload_size_middleware(request, handler):
+    """Record the size of every request body as sent, i.e. compressed if it was"""
+    if request.can_read_body:
+        resource = request.match_info.route.resource
+        endpoint = resource.canonical if resource is not None else request.path
+        size = request.content_length if request.content_length is not None else len(await request.read())
+        request.app['metrics'].payload_bytes.observe(size, endpoint=endpoint)
+    return await handler(request)
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Simple health check endpoint"""
-    return jsonify({"status": "ok"})
 
-@app.route('/generate', methods=['POST'])
-def generate():
+@web.middleware
+async def compression_middleware(request, handler):
+    """Compress large responses for clients that accept it"""
+    response = await handler(request)
+    if (type(response) is web.Response and response.body is not None
+            and len(response.body) >= COMPRESSION_MIN_BYTES):
+        response.enable_compression()
+    return response
+
+
+async def wait_for_answer(jobs, role, prompt, kind="generate"):
+    """Queue a prompt for the human and wait for the answer without holding a thread"""
+    pending, _ = jobs.submit(role, prompt, kind)
+    try:
+        return await asyncio.shield(pending.future)
+    except asyncio.CancelledError:
+        # Agent went away - don't ask the human to answer it unless
+        # another agent is waiting on the same prompt
+        if not pending.done:
+            jobs.release(pending)
+            jobs.abandoned(f"/{kind}", "disconnect")
+        raise
+
+
+async def generate(request):
     """
     Handle generation request from agents
-    
+
     This endpoint receives prompts from CrewAI agents and
-    relays them to the human user via the console. The human's
+    queues them for the human user on the console. The human's
     response is then sent back to the agent.
     """
     try:
-        data = request.json
+        data = await read_payload(request)
         prompt = data.get('prompt', '')
         role = data.get('role', 'Agent')
-        
-        # Display agent's message to human
-        print(f"\n\n{'=' * 40}")
-        print(f"Message from {role}:")
-        print(f"{'=' * 40}")
-        print(prompt)
-        print(f"{'=' * 40}")
-        
-        # Get human's response
-        print("\nYour response (type your answer and press Enter):")
-        human_response = input("> ")
-        
+        stream = data.get('stream', False)
+
+        human_response = await wait_for_answer(request.app['jobs'], role, prompt)
+
+        # Streaming clients receive the response as newline-delimited JSON chunks
+        if stream:
+            response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+            await response.prepare(request)
+            for line in human_response.splitlines(keepends=True):
+                await response.write((json.dumps({"token": line}) + "\n").encode('utf-8'))
+            await response.write((json.dumps({"done": True, "role": "Human"}) + "\n").encode('utf-8'))
+            await response.write_eof()
+            return response
+
         # Return human's response to the agent
-        return jsonify({
+        return web.json_response({
             "response": human_response,
             "role": "Human"
         })
-        
+
+    except (asyncio.CancelledError, web.HTTPException):
+        raise
     except Exception as e:
         logger.error(f"Error in generate: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        return web.json_response({"error": str(e)}, status=500)
+
+
+async def message(request):
+    """
+    Handle a message from the WindsurfCustomerTool
+
+    Customer-tool messages are queued on the same session as /generate
+    prompts, so they are shown to the human in the same arrival order.
+    """
+    try:
+        data = await read_payload(request, field='message')
+        text = data.get('message', '')
+        if not text:
+            return web.json_response({"error": "message is required"}, status=400)
+
+        customer_response = await wait_for_answer(
+            request.app['jobs'], data.get('role', 'Customer Tool'), text, kind="message"
+        )
+        return web.json_response({"response": customer_response})
+
+    except (asyncio.CancelledError, web.HTTPException):
+        raise
+    except Exception as e:
+        logger.error(f"Error in message: {str(e)}")
+        return web.json_response({"error": str(e)}, status=500)
+
+
+async def submit_job(request):
+    """
+    Submit a prompt as a job
+
+    Returns immediately with a job id. The result is collected with
+    GET /jobs/<id> (long-poll) or GET /jobs/<id>/events (server-sent events),
+    so slow human responses never hit an HTTP timeout.
+    """
+    try:
+        data = await read_payload(request)
+        kind = data.get('kind', 'generate')
+        if kind not in JOB_KINDS:
+            return web.json_response({"error": f"kind must be one of {', '.join(JOB_KINDS)}"}, status=400)
+        job, source = request.app['jobs'].submit(data.get('role', 'Agent'), data.get('prompt', ''), kind)
+        if not job.done:
+            JobStore.touch(job)
+        return web.json_response(dict(JobStore.describe(job), source=source), status=202)
+
+    except web.HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in submit_job: {str(e)}")
+        return web.json_response({"error": str(e)}, status=500)
+
+
+async def get_job(request):
+    """Return a job's status, waiting up to ?wait=<seconds> for it to finish"""
+    job = request.app['jobs'].get(request.match_info['job_id'])
+    if job is None:
+        return web.json_response({"error": "Unknown job"}, status=404)
+
+    try:
+        wait = min(float(request.query.get('wait', 0)), MAX_POLL_WAIT)
+    except ValueError:
+        return web.json_response({"error": "wait must be a number"}, status=400)
+    # A poll that ends without an answer is normal - the client polls again
+    JobStore.touch(job)
+    if wait > 0:
+        await JobStore.wait(job, wait)
+        JobStore.touch(job)
+    return web.json_response(JobStore.describe(job))
+
+
+async def job_events(request):
+    """Stream a job's result as server-sent events, with keep-alive comments while pending"""
+    job = request.app['jobs'].get(request.match_info['job_id'])
+    if job is None:
+        return web.json_response({"error": "Unknown job"}, status=404)
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+    })
+    await response.prepare(request)
+    JobStore.touch(job)
+    while not await JobStore.wait(job, SSE_KEEPALIVE):
+        JobStore.touch(job)
+        await response.write(b": keep-alive\n\n")
+
+    status = JobStore.describe(job)
+    if status['status'] == 'done':
+        for line in status['response'].splitlines(keepends=True):
+            await response.write(f"event: token\ndata: {json.dumps({'token': line})}\n\n".encode('utf-8'))
+    await response.write(f"event: {status['status']}\ndata: {json.dumps(status)}\n\n".encode('utf-8'))
+    await response.write_eof()
+    return response
+
+
+async def cancel_job(request):
+    """Cancel a job that the client no longer needs"""
+    job = request.app['jobs'].cancel(request.match_info['job_id'])
+    if job is None:
+        return web.json_response({"error": "Unknown job"}, status=404)
+    return web.json_response(JobStore.describe(job))
+
+
+async def stream(request):
+    """
+    Receive tokens relayed from agents as they are generated
+
+    This lets the operator follow long local-model generations from
+    the bridge console instead of waiting for the complete answer.
+    """
+    try:
+        data = await request.json()
+        tokens = data.get('tokens', '')
+        if tokens:
+            print(tokens, end='', flush=True)
+        if data.get('done'):
+            print(f"\n[{data.get('role', 'Agent')} finished generating]", flush=True)
+        return web.json_response({"status": "ok"})
+
+    except Exception as e:
+        logger.error(f"Error in stream: {str(e)}")
+        return web.json_response({"error": str(e)}, status=500)
+
+
+async def list_operators(request):
+    """Operators, the roles routed to them and how many prompts each has waiting"""
+    return web.json_response({"operators": request.app['router'].describe()})
+
+
+def operator_refused(router, operator):
+    """Response for an operator the operator API doesn't serve: unknown, or the local console"""
+    if router.get(operator) is None:
+        return web.json_response({"error": "Unknown operator"}, status=404)
+    return web.json_response({"error": f"Operator {operator} answers at the bridge console"}, status=403)
+
+
+async def operator_next(request):
+    """
+    Hand the next prompt for an operator to a remote operator client
+
+    Waits up to ?wait=<seconds> for a prompt and answers 204 if none arrives.
+    The prompt is queued again if it is not answered within OPERATOR_LEASE.
+    The console operator's prompts are only answered at the bridge console.
+    """
+    router, operator = request.app['router'], request.match_info['operator']
+    if not router.is_remote(operator):
+        return operator_refused(router, operator)
+    session = router.get(operator)
+    try:
+        wait = min(float(request.query.get('wait', 0)), MAX_POLL_WAIT)
+    except ValueError:
+        return web.json_response({"error": "wait must be a number"}, status=400)
+
+    if wait > 0:
+        try:
+            pending = await asyncio.wait_for(session.next_prompt(), wait)
+        except asyncio.TimeoutError:
+            return web.Response(status=204)
+    else:
+        taken = session.take_pending(1)
+        if not taken:
+            return web.Response(status=204)
+        pending = taken[0]
+
+    lease = session.lease(pending, OPERATOR_LEASE)
+    memory = request.app['memory']
+    suggestions = memory.search(pending.prompt) if memory else []
+    return web.json_response({
+        "job_id": pending.id,
+        "lease": lease,
+        "role": pending.role,
+        "kind": pending.kind,
+        "prompt": pending.prompt,
+        "waiters": pending.waiters,
+        "waiting": len(session),
+        "suggestions": [{"score": score, "answer": entry['answer']} for score, entry in suggestions],
+    })
+
+
+async def operator_answer(request):
+    """
+    Deliver a remote operator's answer to a prompt
+
+    Only the operator the prompt was routed to may answer it, and only while
+    holding the lease it was handed with the prompt: 403 for another
+    operator's prompt, 409 if it was already answered or the lease expired.
+    """
+    try:
+        data = await request.json()
+        router, operator = request.app['router'], request.match_info['operator']
+        if not router.is_remote(operator):
+            return operator_refused(router, operator)
+        job = request.app['jobs'].get(data.get('job_id', ''))
+        if job is None:
+            return web.json_response({"error": "Unknown job"}, status=404)
+        if job.operator != operator:
+            return web.json_response({"error": f"Job is routed to operator {job.operator}"}, status=403)
+        if job.done:
+            return web.json_response(JobStore.describe(job), status=409)
+        if job.lease is None or data.get('lease') != job.lease:
+            return web.json_response(dict(JobStore.describe(job), error="Lease expired or not held"),
+                                     status=409)
+
+        response = data.get('response', '')
+        job.lease = None
+        job.resolve(response)
+        memory = request.app['memory']
+        if memory:
+            memory.record(job.role, job.prompt, response, job.kind)
+        logger.info(f"Operator {operator} answered {job.role}")
+        return web.json_response(JobStore.describe(job))
+
+    except Exception as e:
+        logger.error(f"Error in operator_answer: {str(e)}")
+        return web.json_response({"error": str(e)}, status=500)
+
+
+async def expire_jobs(jobs):
+    """Periodically release jobs whose polling client has gone away"""
+    while True:
+        await asyncio.sleep(JOB_SWEEP_INTERVAL)
+        jobs.expire()
+
+
+async def start_operator(app):
+    app['operator'] = asyncio.create_task(console_operator(app['session'], app['memory'],
+                                                           **app['operator_options']))
+    app['job_sweeper'] = asyncio.create_task(expire_jobs(app['jobs']))
+
+
+async def stop_operator(app):
+    app['operator'].cancel()
+    app['job_sweeper'].cancel()
+
+
+def create_app(session=None, memory=None, batch_window=0.5, max_batch=5, recorder=None, replayer=None,
+               routes=None):
+    """
+    Create the bridge application
+
+    Args:
+        session: BridgeSession of the console operator, a new console session by default
+        memory: Optional AnswerMemory for suggestions and auto-replies
+        batch_window: Seconds the operator waits for more prompts to ask together
+        max_batch: Maximum number of agent questions combined into one prompt
+        recorder: Optional TranscriptRecorder that every exchange is appended to
+        replayer: Optional TranscriptReplayer that answers prompts from a recorded run
+        routes: Optional 'PATTERN=OPERATOR' rules sending roles to remote operators
+
+    Returns:
+        aiohttp web.Application
+    """
+    app = web.Application(middlewares=[payload_size_middleware, compression_middleware])
+    app['router'] = OperatorRouter.from_specs(routes, session)
+    app['session'] = app['router'].default
+    app['memory'] = memory
+    app['operator_options'] = {"batch_window": batch_window, "max_batch": max_batch}
+    app['jobs'] = JobStore(app['session'], memory=memory, recorder=recorder, replayer=replayer,
+                           router=app['router'])
+    app['prompts'] = PromptCache()
+    app['metrics'] = app['jobs'].metrics = BridgeMetrics(app['router'], app['jobs'])
+    app.router.add_get('/health', health_check)
+    app.router.add_get('/metrics', metrics)
+    app.router.add_post('/generate', generate)
+    app.router.add_post('/message', message)
+    app.router.add_post('/stream', stream)
+    app.router.add_post('/jobs', submit_job)
+    app.router.add_get('/jobs/{job_id}', get_job)
+    app.router.add_get('/jobs/{job_id}/events', job_events)
+    app.router.add_delete('/jobs/{job_id}', cancel_job)
+    app.router.add_get('/operators', list_operators)
+    app.router.add_get('/operators/{operator}/next', operator_next)
+    app.router.add_post('/operators/{operator}/answer', operator_answer)
+    app.on_startup.append(start_operator)
+    app.on_cleanup.append(stop_operator)
+    return app
+
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="CrewSurf bridge server")
+    parser.add_argument('--answers-file', default='bridge_answers.jsonl',
+                        help="JSONL file where answered questions are remembered")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="Don't remember answers or suggest them")
+    parser.add_argument('--auto-reply', action='store_true',
+                        help="Automatically answer customer questions that closely match an earlier one")
+    parser.add_argument('--auto-reply-threshold', type=float, default=0.9,
+                        help="Minimum similarity (0-1) for an automatic reply")
+    parser.add_argument('--batch-window', type=float, default=0.5,
+                        help="Seconds to wait for other agents' questions to ask together")
+    parser.add_argument('--max-batch', type=int, default=5,
+                        help="Most agent questions combined into one prompt (1 disables batching)")
+    parser.add_argument('--record', metavar='TRANSCRIPT',
+                        help="Append every prompt/response exchange to this JSONL transcript")
+    parser.add_argument('--replay', metavar='TRANSCRIPT',
+                        help="Answer prompts from a recorded transcript instead of asking the human")
+    parser.add_argument('--replay-fallback', choices=REPLAY_FALLBACKS, default='human',
+                        help="What to do with prompts that are not in the replayed transcript")
+    parser.add_argument('--route', action='append', metavar='PATTERN=OPERATOR',
+                        help="Send prompts from roles matching PATTERN (a glob, e.g. '*Architect*') to a "
+                             "remote operator instead of this console; may be repeated")
+    args = parser.parse_args()
+
+    memory = None
+    if not args.no_memory:
+        memory = AnswerMemory(args.answers_file, auto_reply=args.auto_reply,
+                              auto_reply_threshold=args.auto_reply_threshold)
+
+    recorder = TranscriptRecorder(args.record) if args.record else None
+    replayer = TranscriptReplayer(args.replay, fallback=args.replay_fallback) if args.replay else None
+
     print("=" * 50)
     print("🌉 CrewSurf Bridge Server")
     print("=" * 50)
@@ -66,7 +484,17 @@ if __name__ == '__main__':
     print("This allows CrewAI agents to communicate with humans")
     print("\nServer running at http://localhost:8089")
     print("Use another terminal to run the CrewAI agents")
+    if recorder:
+        print(f"Recording exchanges to {args.record}")
+    if replayer:
+        print(f"Replaying responses from {args.replay} (fallback: {args.replay_fallback})")
+    for rule in args.route or ():
+        pattern, _, operator = rule.rpartition("=")
+        print(f"Routing roles matching '{pattern}' to operator '{operator}' "
+              f"(python bridge/remote_operator.py --name {operator})")
     print("=" * 50)
-    
-    # Run the Flask app
-    app.run(host='0.0.0.0', port=8089, debug=False)
+
+    # Run the bridge server
+    app = create_app(memory=memory, batch_window=args.batch_window, max_batch=args.max_batch,
+                     recorder=recorder, replayer=replayer, routes=args.route)
+    web.run_app(app, host='0.0.0.0', port=8089, print=None, **SERVER_OPTIONS)
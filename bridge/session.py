@@ -0,0 +1,130 @@
+"""
+Bridge sessions for CrewSurf
+
+A session is one human operator answering agent prompts. Prompts from every
+agent are queued per session and handed to the operator one at a time in
+arrival order, while each agent waits on a future instead of a blocked thread.
+"""
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger('CascadeBridge')
+
+
+class PendingPrompt:
+    """A prompt waiting for a human response"""
+
+    def __init__(self, role, prompt, kind="generate"):
+        """
+        Args:
+            role: Role of the agent asking
+            prompt: Text shown to the human
+            kind: Endpoint the prompt came from ('generate' or 'message')
+        """
+        self.id = uuid.uuid4().hex
+        self.role = role
+        self.prompt = prompt
+        self.kind = kind
+        self.created = time.time()
+        self.waiters = 1  # Number of requests waiting on this prompt
+        self.source = "human"  # Who answered: 'human', 'auto' or 'replay'
+        self.answered = None  # time.time() when the response was delivered
+        self.last_seen = None  # time.time() a polling client last asked for the job, None if a request is held open
+        self.operator = None  # Name of the operator session the prompt was routed to
+        self.lease = None  # Token of the remote operator lease currently held on the prompt
+        self.future = asyncio.get_running_loop().create_future()
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    def resolve(self, response):
+        """Deliver the human's response to the waiting agent"""
+        if not self.future.done():
+            self.answered = time.time()
+            self.future.set_result(response)
+
+    def fail(self, error):
+        """Fail the prompt with an error instead of a response"""
+        if not self.future.done():
+            self.future.set_exception(RuntimeError(error))
+
+    def cancel(self):
+        """Drop the prompt, e.g. because the agent disconnected"""
+        if not self.future.done():
+            self.future.cancel()
+
+
+class BridgeSession:
+    """First-in, first-out queue of prompts for one operator"""
+
+    def __init__(self, name="console"):
+        self.name = name
+        self._queue = deque()
+        self._available = asyncio.Event()
+
+    def submit(self, pending):
+        """Queue a prompt for the operator"""
+        self._queue.append(pending)
+        self._available.set()
+        logger.info(f"Queued prompt {pending.id[:8]} from {pending.role} ({len(self)} waiting)")
+        return pending
+
+    async def next_prompt(self):
+        """Wait for the oldest prompt that still has an agent waiting on it"""
+        while True:
+            while self._queue and self._queue[0].done:
+                self._queue.popleft()
+            if self._queue:
+                return self._queue.popleft()
+            self._available.clear()
+            await self._available.wait()
+
+    def take_pending(self, limit):
+        """Remove and return up to limit more waiting prompts, oldest first"""
+        taken = []
+        while self._queue and len(taken) < limit:
+            pending = self._queue.popleft()
+            if not pending.done:
+                taken.append(pending)
+        return taken
+
+    def requeue(self, prompts):
+        """Put prompts back at the front of the queue, keeping their order"""
+        for pending in reversed(prompts):
+            if not pending.done:
+                self._queue.appendleft(pending)
+        if self._queue:
+            self._available.set()
+
+    def lease(self, pending, seconds):
+        """
+        Hand a prompt to a remote operator for up to seconds
+
+        The prompt is queued again if it is still unanswered when the lease
+        runs out, and answers must carry the returned token, so an answer to
+        an expired lease can't be applied on top of a newer one.
+
+        Returns:
+            The lease token
+        """
+        token = uuid.uuid4().hex
+        pending.lease = token
+
+        def expire():
+            if not pending.done and pending.lease == token:
+                logger.warning(f"Operator {self.name} did not answer prompt {pending.id[:8]} - queueing it again")
+                pending.lease = None
+                self.requeue([pending])
+        asyncio.get_running_loop().call_later(seconds, expire)
+        return token
+
+    def pending(self):
+        """Prompts still waiting, oldest first"""
+        return [p for p in self._queue if not p.done]
+
+    def __len__(self):
+        return len(self.pending())
@@ -0,0 +1,134 @@
+"""
+Transcript recording and replay for the bridge
+
+A recorded run appends every prompt/response exchange to a JSONL transcript.
+In replay mode the bridge answers prompts from such a transcript instead of
+asking the human, matching on the asking role and a hash of the prompt, so a
+full pipeline run can be repeated unattended, e.g. to benchmark it.
+"""
+import json
+import time
+import hashlib
+import logging
+from collections import defaultdict, deque
+
+logger = logging.getLogger('CascadeBridge')
+
+# What to do with a prompt that is not in the transcript
+REPLAY_FALLBACKS = ("human", "sequence", "fail")
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+class TranscriptRecorder:
+    """Appends every answered prompt to a JSONL transcript"""
+
+    def __init__(self, path):
+        self.path = path
+        self.recorded = 0
+
+    def record(self, pending, response, source):
+        """
+        Append one exchange
+
+        Args:
+            pending: The PendingPrompt that was answered
+            response: The response that was delivered
+            source: Where the response came from ('human', 'auto', 'replay', ...)
+        """
+        entry = {
+            "timestamp": time.time(),
+            "role": pending.role,
+            "kind": pending.kind,
+            "prompt_hash": prompt_hash(pending.prompt),
+            "prompt": pending.prompt,
+            "response": response,
+            "source": source,
+            "latency": time.time() - pending.created,
+        }
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+        self.recorded += 1
+
+
+class TranscriptReplayer:
+    """
+    Serves responses from a recorded transcript.
+
+    Prompts are matched by (kind, role, prompt hash). A prompt recorded several
+    times is answered with its responses in recorded order, and the last one is
+    repeated once they run out. Unmatched prompts follow the fallback policy:
+
+    - 'human': queue the prompt for the operator as usual
+    - 'sequence': use the next unused response recorded for the same role,
+      which tolerates prompts that embed timestamps or other run-specific text
+    - 'fail': fail the job so the run stops at the first divergence
+    """
+
+    def __init__(self, path, fallback="human"):
+        if fallback not in REPLAY_FALLBACKS:
+            raise ValueError(f"Unknown replay fallback '{fallback}', expected one of {REPLAY_FALLBACKS}")
+        self.path = path
+        self.fallback = fallback
+        self._by_prompt = defaultdict(deque)
+        self._last = {}
+        self._by_role = defaultdict(deque)
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        count = 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    key = (entry.get("kind", "generate"), entry["role"], entry["prompt_hash"])
+                    self._by_prompt[key].append(entry["response"])
+                    self._by_role[entry["role"]].append(entry)
+                    count += 1
+                except (json.JSONDecodeError, KeyError):
+                    logger.warning(f"Skipping unreadable line in {self.path}")
+        logger.info(f"Loaded {count} recorded exchanges from {self.path} (fallback: {self.fallback})")
+
+    def _consume(self, key):
+        """Take the next recorded response for key, and drop it from the role sequence"""
+        response = self._by_prompt[key].popleft()
+        self._last[key] = response
+        role_entries = self._by_role[key[1]]
+        for entry in role_entries:
+            if entry["prompt_hash"] == key[2] and entry["response"] == response:
+                role_entries.remove(entry)
+                break
+        return response
+
+    def lookup(self, role, prompt, kind="generate"):
+        """
+        Find the recorded response for a prompt
+
+        Returns:
+            Tuple of (response, how) where how is 'match', 'repeat' or 'sequence',
+            or (None, 'human') / (None, 'fail') when the fallback policy applies
+        """
+        key = (kind, role, prompt_hash(prompt))
+        if self._by_prompt.get(key):
+            self.hits += 1
+            return self._consume(key), 'match'
+        if key in self._last:
+            self.hits += 1
+            return self._last[key], 'repeat'
+
+        self.misses += 1
+        if self.fallback == "sequence" and self._by_role.get(role):
+            entry = self._by_role[role].popleft()
+            recorded_key = (entry.get("kind", "generate"), role, entry["prompt_hash"])
+            if self._by_prompt.get(recorded_key):
+                self._by_prompt[recorded_key].popleft()
+            logger.warning(f"No recorded response for this prompt from {role} - "
+                           f"using the next one recorded for that role")
+            return entry["response"], 'sequence'
+        if self.fallback == "fail":
+            return None, 'fail'
+        return None, 'human'
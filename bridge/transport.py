@@ -0,0 +1,140 @@
+"""
+Compressed transport for bridge payloads
+
+Agent prompts carry whole source files and long scratchpads, and each call from
+the same agent usually repeats most of the previous prompt. Request bodies
+above a small threshold are compressed with zstd (when the zstandard package is
+installed on both sides) or gzip, and a prompt that shares most of its text with
+the previous one from the same role is sent as a delta against it. The bridge
+advertises what it accepts on /health, so older bridges keep getting plain JSON;
+aiohttp decompresses request bodies on the server side.
+"""
+import gzip
+import json
+import hashlib
+from collections import OrderedDict
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies smaller than this are sent uncompressed
+COMPRESSION_MIN_BYTES = 1024
+
+# Only send a delta if it is at most this fraction of the full prompt
+DELTA_MAX_RATIO = 0.5
+
+# Encodings this side can compress request bodies with, best first
+SUPPORTED_ENCODINGS = ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+class UnknownDeltaBase(KeyError):
+    """A delta refers to a prompt the receiver no longer has"""
+
+
+def prompt_digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def compress(body, encoding):
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    raise ValueError(f"Cannot compress with {encoding}")
+
+
+def choose_encoding(accepted):
+    """Pick the best encoding both sides support, or None"""
+    for encoding in SUPPORTED_ENCODINGS:
+        if encoding in (accepted or ()):
+            return encoding
+    return None
+
+
+def encode_body(payload, encodings=("gzip",)):
+    """
+    Serialise a JSON payload, compressing it if it is large enough
+
+    Args:
+        payload: JSON-serialisable request body
+        encodings: Encodings the receiver accepts
+
+    Returns:
+        Tuple of (body bytes, headers)
+    """
+    body = json.dumps(payload).encode('utf-8')
+    headers = {"Content-Type": "application/json"}
+    encoding = choose_encoding(encodings)
+    if encoding and len(body) >= COMPRESSION_MIN_BYTES:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return body, headers
+
+
+def make_delta(base, text):
+    """
+    Describe text as an edit of base: a shared prefix and suffix around new middle text
+
+    Returns:
+        Delta dictionary, or None if the texts share too little to be worth it
+    """
+    limit = min(len(base), len(text))
+    prefix = 0
+    while prefix < limit and base[prefix] == text[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and base[-1 - suffix] == text[-1 - suffix]:
+        suffix += 1
+    middle = text[prefix:len(text) - suffix]
+    if len(middle) > len(text) * DELTA_MAX_RATIO:
+        return None
+    return {"base": prompt_digest(base), "prefix": prefix, "suffix": suffix, "text": middle}
+
+
+def apply_delta(base, delta):
+    """Rebuild the text a delta describes from its base"""
+    suffix = base[len(base) - delta["suffix"]:] if delta["suffix"] else ""
+    return base[:delta["prefix"]] + delta["text"] + suffix
+
+
+class PromptCache:
+    """Recently received prompts by digest, the bases deltas are applied to"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._prompts = OrderedDict()
+
+    def remember(self, text):
+        digest = prompt_digest(text)
+        self._prompts[digest] = text
+        self._prompts.move_to_end(digest)
+        while len(self._prompts) > self.max_entries:
+            self._prompts.popitem(last=False)
+        return digest
+
+    def resolve(self, delta):
+        """Apply a delta to the cached prompt it refers to"""
+        base = self._prompts.get(delta["base"])
+        if base is None:
+            raise UnknownDeltaBase(delta["base"])
+        return apply_delta(base, delta)
+
+
+def decode_payload(body, cache=None, field="prompt"):
+    """
+    Decode a (decompressed) request body into a JSON payload with field filled in
+
+    Resolves a '<field>_delta' entry against cache, and remembers the full text
+    in cache so later requests can refer to it.
+    """
+    payload = json.loads(body or b"{}")
+    delta = payload.pop(f"{field}_delta", None)
+    if delta is not None:
+        if cache is None:
+            raise UnknownDeltaBase(delta.get("base"))
+        payload[field] = cache.resolve(delta)
+    if cache is not None and payload.get(field):
+        cache.remember(payload[field])
+    return payload
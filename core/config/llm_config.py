@@ -15,9 +15,66 @@ except ImportError:
 
 # Base configuration
 OLLAMA_BASE_URL = "http://localhost:11434"
+
+# Ollama servers that can share the load. Set OLLAMA_BASE_URLS to a comma-separated
+# list (e.g. "http://box1:11434,http://box2:11434") to route requests across several machines
+OLLAMA_BASE_URLS = [
+    url.strip().rstrip("/")
+    for url in os.environ.get("OLLAMA_BASE_URLS", OLLAMA_BASE_URL).split(",")
+    if url.strip()
+]
+OLLAMA_BASE_URL = OLLAMA_BASE_URLS[0]  # Primary server for callers that need a single URL
+
 BASE_MODEL_NAME = 'qwen3'  # Base model name without provider prefix
 CREWAI_MODEL_NAME = f"ollama/{BASE_MODEL_NAME}"  # Model name with provider prefix for CrewAI/LiteLLM
 
+EMBEDDING_MODEL_NAME = 'nomic-embed-text'  # Local embedding model used in place of OpenAI embeddings
+
+# How long Ollama keeps models loaded after a request. Human-in-the-loop sessions
+# can sit idle for a long time, so keep models resident well past Ollama's 5 minute default
+OLLAMA_KEEP_ALIVE = "60m"
+
+# Send LiteLLM completions to Ollama's /api/chat endpoint with structured messages
+# and native tool definitions, and the server's chat template. Off by default:
+# conversations are flattened into a single prompt by the patched ollama_pt, whose
+# prompt compiler only renders the new messages of a conversation, and sent to
+# /api/generate. Ollama reuses the KV cache of the previous turn on either endpoint
+OLLAMA_USE_CHAT_API = os.getenv("CREWSURF_OLLAMA_CHAT_API", "false").lower() in ("1", "true", "yes")
+
+# Conversation history compaction. Once a conversation's estimated prompt size passes
+# the threshold, messages older than the last HISTORY_KEEP_LAST_MESSAGES are replaced by
+# cached summaries of HISTORY_SUMMARY_CHUNK_MESSAGES messages each
+HISTORY_COMPACTION_ENABLED = True
+HISTORY_TOKEN_THRESHOLD = 6000
+HISTORY_KEEP_LAST_MESSAGES = 6
+HISTORY_SUMMARY_CHUNK_MESSAGES = 4
+HISTORY_SUMMARY_MODEL = BASE_MODEL_NAME  # Set to None to use extractive summaries without a model call
+
+# Streaming configuration
+STREAMING_ENABLED = True  # Print tokens to the console as they are generated
+CASCADE_BRIDGE_URL = "http://localhost:8089"
+STREAM_TO_BRIDGE = False  # Also relay streamed tokens to the bridge's /stream endpoint
+# Serve CascadeLLM's client-side latency on this port's /metrics so it can be scraped
+# next to the bridge's own /metrics; 0 leaves it off
+CLIENT_METRICS_PORT = int(os.getenv("CREWSURF_CLIENT_METRICS_PORT", 0))
+
+# Customer conversation history: the most recent entries stay in memory, older
+# ones are appended to a JSONL log in CONVERSATION_LOG_DIR
+CONVERSATION_HISTORY_MAX_ENTRIES = 200
+CONVERSATION_LOG_DIR = os.getenv("CREWSURF_CONVERSATION_LOG_DIR", "conversation_logs")
+
+# Pipeline runs checkpoint each completed task here, one subdirectory per run,
+# so a crashed run can be resumed without repeating finished tasks
+PIPELINE_RUN_DIR = os.getenv("CREWSURF_RUN_DIR", "crew_runs")
+
+# Run crew tasks whose dependencies are done concurrently instead of one at a time
+# under the Director. Off by default: tasks then run directly on their agents, without
+# the Director managing them or delegating work. MODEL_CONCURRENCY caps the tasks in
+# flight; Ollama serves a few requests per loaded model in parallel, so the default
+# is two per server
+PARALLEL_TASK_EXECUTION = os.getenv("CREWSURF_PARALLEL_TASKS", "false").lower() in ("1", "true", "yes")
+MODEL_CONCURRENCY = int(os.getenv("CREWSURF_MODEL_CONCURRENCY", 2 * len(OLLAMA_BASE_URLS)))
+
 # Agent role to temperature mapping
 AGENT_TEMPERATURE_MAP = {
     # More creative for architectural and writing tasks
@@ -42,7 +99,7 @@ AGENT_TEMPERATURE_MAP = {
 # Cache for LLM instances to avoid recreation
 _llm_cache = {}
 
-def get_ollama_llm(role='default', use_provider_prefix=False, override_temperature=None):
+def get_ollama_llm(role='default', use_provider_prefix=False, override_temperature=None, streaming=None):
     """
     Create an Ollama LLM instance with parameters based on agent role
     
@@ -51,12 +108,17 @@ def get_ollama_llm(role='default', use_provider_prefix=False, override_temperatu
         use_provider_prefix: If True, use 'ollama/qwen3' format for LiteLLM compatibility
                            If False, use 'qwen3' format for direct Ollama API calls
         override_temperature: Optionally override the role-based temperature
+        streaming: If True, stream tokens to the console (and the bridge if enabled)
+                   as they arrive; defaults to STREAMING_ENABLED
     
     Returns:
         Configured Ollama LLM instance
     """
+    if streaming is None:
+        streaming = STREAMING_ENABLED
+    
     # Cache key includes all parameters that could affect the LLM instance
-    cache_key = f"{role}_{use_provider_prefix}_{override_temperature}"
+    cache_key = f"{role}_{use_provider_prefix}_{override_temperature}_{streaming}"
     
     # Return cached instance if available
     if cache_key in _llm_cache:
@@ -66,12 +128,35 @@ def get_ollama_llm(role='default', use_provider_prefix=False, override_temperatu
     model = CREWAI_MODEL_NAME if use_provider_prefix else BASE_MODEL_NAME
     temperature = override_temperature or AGENT_TEMPERATURE_MAP.get(role, AGENT_TEMPERATURE_MAP['default'])
     
-    # Create the Ollama instance with explicit base_url to avoid invalid port errors
-    llm = Ollama(
-        model=model,
-        temperature=temperature,
-        base_url=OLLAMA_BASE_URL
-    )
+    # Stream tokens through a per-role callback handler that also logs time-to-first-token
+    callbacks = None
+    if streaming:
+        from core.streaming import StreamingConsoleHandler
+        callbacks = [StreamingConsoleHandler(
+            role,
+            bridge_url=CASCADE_BRIDGE_URL if STREAM_TO_BRIDGE else None
+        )]
+    
+    if len(OLLAMA_BASE_URLS) > 1:
+        # Spread requests over every configured server with failover
+        from core.ollama_pool import PooledOllamaLLM, get_ollama_pool
+        llm = PooledOllamaLLM(
+            clients={
+                url: Ollama(model=model, temperature=temperature, base_url=url, keep_alive=OLLAMA_KEEP_ALIVE)
+                for url in OLLAMA_BASE_URLS
+            },
+            pool=get_ollama_pool(),
+            callbacks=callbacks
+        )
+    else:
+        # Create the Ollama instance with explicit base_url to avoid invalid port errors
+        llm = Ollama(
+            model=model,
+            temperature=temperature,
+            base_url=OLLAMA_BASE_URLS[0],
+            keep_alive=OLLAMA_KEEP_ALIVE,
+            callbacks=callbacks
+        )
     
     # Cache the instance for future use
     _llm_cache[cache_key] = llm
@@ -93,6 +178,20 @@ def get_all_agent_configs():
             }
     return agents_config
 
+def get_referenced_models():
+    """
+    Get every Ollama model name referenced by this configuration
+    
+    Returns:
+        Dictionary mapping model names (without provider prefix) to True for
+        embedding models and False for generation models
+    """
+    models = {BASE_MODEL_NAME: False}
+    for config in get_all_agent_configs().values():
+        models.setdefault(config["model"].split("/", 1)[-1], False)
+    models[EMBEDDING_MODEL_NAME] = True
+    return models
+
 def print_model_config():
     """Print the current model configuration for all agents"""
     print("\n=== Agent Model Configuration ===")
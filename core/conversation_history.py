@@ -0,0 +1,118 @@
+"""
+Bounded conversation history for CrewSurf
+
+Customer conversations can run all day. Only the most recent entries are kept
+in memory, in a ring buffer of compact tuples; older entries are appended to a
+JSONL log on disk. The full history can still be read page by page or streamed
+entry by entry, oldest first.
+"""
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from array import array
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationHistory:
+    """
+    Ring buffer of conversation entries that spills evicted entries to disk.
+
+    Entries are returned as {"role", "content", "timestamp"} dictionaries with
+    ISO timestamps, in the order they were appended.
+    """
+
+    def __init__(self, max_entries: int = 200, log_dir: Optional[str] = "conversation_logs",
+                 name: str = "conversation"):
+        """
+        Args:
+            max_entries: Number of recent entries kept in memory
+            log_dir: Directory for the spill log, or None to discard evicted entries
+            name: Prefix of the spill log file name
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.log_dir = log_dir
+        self.name = name
+        self.log_path: Optional[str] = None  # Created on the first spill
+        self._buffer = deque()
+        self._spilled = 0
+        self._dropped = 0
+        self._line_offsets = array('q')  # Byte offset of each spilled entry, for paging
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _as_dict(entry) -> Dict[str, Any]:
+        role, content, timestamp = entry
+        return {"role": role, "content": content,
+                "timestamp": datetime.fromtimestamp(timestamp).isoformat()}
+
+    def _spill(self, entry) -> None:
+        if self.log_dir is None:
+            self._dropped += 1
+            return
+        if self.log_path is None:
+            os.makedirs(self.log_dir, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            self.log_path = os.path.join(
+                self.log_dir, f"{self.name}-{stamp}-{os.getpid()}-{uuid.uuid4().hex[:6]}.jsonl"
+            )
+            logger.info(f"Spilling older conversation history to {self.log_path}")
+        line = (json.dumps(self._as_dict(entry)) + "\n").encode('utf-8')
+        with open(self.log_path, 'ab') as f:
+            self._line_offsets.append(f.tell())
+            f.write(line)
+        self._spilled += 1
+
+    def append(self, role: str, content: str) -> None:
+        """Add an entry, spilling the oldest in-memory entry if the buffer is full"""
+        with self._lock:
+            if len(self._buffer) >= self.max_entries:
+                self._spill(self._buffer.popleft())
+            self._buffer.append((role, content, time.time()))
+
+    def __len__(self) -> int:
+        """Number of entries that can still be read, in memory and on disk"""
+        return self._spilled + len(self._buffer)
+
+    def _read_spilled(self, start: int, stop: int) -> Iterator[Dict[str, Any]]:
+        if start >= stop:
+            return
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._line_offsets[start])
+            for _ in range(stop - start):
+                yield json.loads(f.readline())
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Stream every entry, oldest first, without loading the spill log into memory"""
+        with self._lock:
+            spilled = self._spilled
+            buffered = list(self._buffer)
+        yield from self._read_spilled(0, spilled)
+        for entry in buffered:
+            yield self._as_dict(entry)
+
+    def page(self, offset: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Return up to limit entries starting at offset (0 is the oldest readable entry)
+        """
+        with self._lock:
+            spilled = self._spilled
+            buffered = list(self._buffer)
+        stop = min(offset + limit, spilled + len(buffered))
+        entries = list(self._read_spilled(offset, min(stop, spilled)))
+        entries.extend(self._as_dict(entry) for entry in buffered[max(offset - spilled, 0):max(stop - spilled, 0)])
+        return entries
+
+    def recent(self, count: int = 10) -> List[Dict[str, Any]]:
+        """Return the last count entries from memory"""
+        with self._lock:
+            buffered = list(self._buffer)
+        return [self._as_dict(entry) for entry in buffered[-count:]]
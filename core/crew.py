@@ -1,5 +1,7 @@
 from crewai import Crew, Task, Agent, Process
 from crewai.tools import tool
+from contextlib import contextmanager
+import re
 import time
 import os
 from langchain_community.tools import DuckDuckGoSearchRun
@@ -11,7 +13,11 @@ try:
 except ImportError:
     # Fallback to older import
     from langchain_community.llms import Ollama
-from core.config.llm_config import get_ollama_llm, print_model_config
+from core.config.llm_config import (get_ollama_llm, print_model_config, HISTORY_KEEP_LAST_MESSAGES, PIPELINE_RUN_DIR,
+                                    PARALLEL_TASK_EXECUTION, MODEL_CONCURRENCY)
+from core.task_graph import TaskGraph
+from core.task_executor import TaskGraphExecutor
+from core.run_store import RunStore, task_inputs
 from core.agents.chiefexecutiveofficer import ChiefExecutiveOfficer
 from core.agents.director import Director
 from core.agents.seniorprincipalengineer import SeniorPrincipalEngineer
@@ -101,6 +107,51 @@ task_documentation = Task(
     agent=TechnicalWriter
 )
 
+# Which tasks use which other tasks' outputs. Feedback rounds use this to re-run
+# only the tasks the feedback applies to and what depends on them, and with
+# PARALLEL_TASK_EXECUTION tasks run as soon as their dependencies are done: test
+# harness design works from the specifications, so it overlaps implementation, and
+# the CEO's status report overlaps quality assurance and documentation.
+task_graph = TaskGraph()
+task_graph.add(task_architecture_planning)
+task_graph.add(task_staff_engineering, depends_on=[task_architecture_planning])
+task_graph.add(task_code_implementation, depends_on=[task_architecture_planning, task_staff_engineering])
+task_graph.add(task_code_testing, depends_on=[task_architecture_planning, task_staff_engineering])
+task_graph.add(task_debugging, depends_on=[task_code_implementation, task_code_testing])
+task_graph.add(task_quality_assurance, depends_on=[task_code_implementation, task_code_testing, task_debugging])
+task_graph.add(task_documentation, depends_on=[task_architecture_planning, task_staff_engineering, task_code_implementation])
+task_graph.add(task_team_management, depends_on=[task_architecture_planning])
+task_graph.add(task_customer_oversight, depends_on=[task_team_management])
+
+# Words in customer feedback that point at a task's work; feedback that names
+# none of them revises the final results (the sinks of task_graph)
+feedback_keywords = {
+    task_architecture_planning: ("architecture", "architect", "design", "structure"),
+    task_staff_engineering: ("specification", "specifications", "spec", "specs", "requirements"),
+    task_code_implementation: ("implementation", "implement", "feature", "features", "code"),
+    task_code_testing: ("test", "tests", "testing", "coverage"),
+    task_debugging: ("bug", "bugs", "debug", "debugging", "crash", "error", "errors"),
+    task_quality_assurance: ("quality", "review", "performance", "best practices"),
+    task_documentation: ("documentation", "docs", "readme", "comments", "examples"),
+    task_team_management: ("team", "schedule", "responsibilities", "coordination"),
+    task_customer_oversight: ("status", "progress", "report"),
+}
+
+def feedback_targets(feedback):
+    """Return the tasks customer feedback applies to, in graph order
+    
+    A task is targeted when the feedback mentions its agent's role or one of
+    its feedback_keywords; otherwise the feedback revises the current sinks.
+    """
+    text = feedback.lower()
+    
+    def mentions(phrase):
+        return re.search(rf"\b{re.escape(phrase.lower())}\b", text) is not None
+    
+    targets = [task for task, keywords in feedback_keywords.items()
+               if mentions(task.agent.role) or any(mentions(keyword) for keyword in keywords)]
+    return task_graph.topological_order(targets) if targets else task_graph.sinks()
+
 # Define delegation permissions - who can delegate to whom
 delegation_map = {
     # HeadOfSoftwareQuality can send work back to ChiefArchitect and SeniorPrincipalEngineer
@@ -243,29 +294,33 @@ ollama_embed = OllamaEmbeddings(
     base_url=OLLAMA_BASE_URL  # Explicit base URL to avoid port format errors
 )
 
+def build_crew(tasks):
+    """Create a Crew with the team's hierarchical workflow for the given tasks"""
+    return Crew(
+        agents=[ChiefExecutiveOfficer, Director, ChiefArchitect, StaffEngineer, SeniorPrincipalEngineer, 
+                SoftwareEngineerInTest, MasterDebugger, HeadOfSoftwareQuality, TechnicalWriter],
+        tasks=tasks,
+        verbose=True,
+        process=Process.hierarchical,
+        manager=Director,  # Director manages the workflow
+        manager_llm=manager_llm,  # Added manager_llm as required by newer CrewAI versions
+        memory=False,  # Disable CrewAI's built-in memory system
+        cache=True    # Cache results for better performance
+        # We'll implement our own memory system using FAISS instead of CrewAI's internal memory
+    )
+
 # Create Crew with hierarchical workflow and customer interaction
-crew = Crew(
-    agents=[ChiefExecutiveOfficer, Director, ChiefArchitect, StaffEngineer, SeniorPrincipalEngineer, 
-            SoftwareEngineerInTest, MasterDebugger, HeadOfSoftwareQuality, TechnicalWriter],
-    tasks=[
-        task_architecture_planning, 
-        task_staff_engineering,
-        task_code_implementation,
-        task_code_testing,
-        task_debugging,
-        task_quality_assurance,
-        task_documentation,
-        task_team_management,
-        task_customer_oversight
-    ],
-    verbose=True,
-    process=Process.hierarchical,
-    manager=Director,  # Director manages the workflow
-    manager_llm=manager_llm,  # Added manager_llm as required by newer CrewAI versions
-    memory=False,  # Disable CrewAI's built-in memory system
-    cache=True    # Cache results for better performance
-    # We'll implement our own memory system using FAISS instead of CrewAI's internal memory
-)
+crew = build_crew([
+    task_architecture_planning, 
+    task_staff_engineering,
+    task_code_implementation,
+    task_code_testing,
+    task_debugging,
+    task_quality_assurance,
+    task_documentation,
+    task_team_management,
+    task_customer_oversight
+])
 
 
 def get_customer_input():
@@ -346,7 +401,11 @@ def run_interactive_crew(memory_store=None):
     conversation_history = []
     
     # Initial kickoff
-    initial_result = crew.kickoff()
+    if PARALLEL_TASK_EXECUTION:
+        TaskGraphExecutor(task_graph, MODEL_CONCURRENCY).run()
+        initial_result = crew.tasks[-1].output  # The final task's output, as kickoff() returns
+    else:
+        initial_result = crew.kickoff()
     conversation_history.append({"type": "result", "content": initial_result})
     print("\nInitial work completed. Result:")
     print(initial_result)
@@ -362,17 +421,40 @@ def run_interactive_crew(memory_store=None):
         conversation_history.append({"type": "customer_input", "content": customer_input})
         print("\nProcessing your feedback...")
         
-        # Create a new customer feedback task with access to conversation history
+        # Create a new customer feedback task with the recent customer requests.
+        # Earlier results reach the task as context, so only the inputs are repeated
+        recent = "\n".join(f"- {entry['content']}"
+                           for entry in conversation_history[-HISTORY_KEEP_LAST_MESSAGES:]
+                           if entry["type"] == "customer_input")
+        # The Director turns the feedback into instructions for the tasks it
+        # applies to. Those run after it in the same crew, so their current
+        # results are quoted in the description rather than given as context
+        targets = feedback_targets(customer_input)
+        current = "\n\n".join(f"{target.agent.role}:\n{target.output.raw}"
+                               for target in targets if target.output is not None)
         feedback_task = Task(
-            description=f"Process customer feedback: {customer_input}",
+            description=f"Process customer feedback: {customer_input}\n\nRecent customer requests:\n{recent}"
+                        f"\n\nCurrent results this feedback applies to:\n{current or '(none yet)'}",
             expected_output="Updated work based on customer feedback",
-            agent=Director,  # Director receives customer feedback first
-            context=[f"Previous conversation: {conversation_history}"]  # Give context of previous interactions
+            agent=Director  # Director receives customer feedback first
         )
         
-        # Add task to crew and process
-        crew.tasks.append(feedback_task)
-        result = crew.kickoff()
+        # The targeted tasks take the feedback as an extra input, so they run
+        # again after it, and so does everything downstream of them; the stored
+        # outputs of all other tasks are reused. The edges are added to a copy
+        # of task_graph, so this feedback doesn't carry over into later rounds
+        round_graph = task_graph.copy()
+        round_graph.add(feedback_task)
+        for task in targets:
+            round_graph.add(task, depends_on=[feedback_task])
+        round_tasks = round_graph.affected_by([feedback_task])
+        print(f"Running {len(round_tasks)} of {len(round_graph.tasks)} tasks for this feedback")
+        if PARALLEL_TASK_EXECUTION:
+            TaskGraphExecutor(round_graph, MODEL_CONCURRENCY).run(round_tasks)
+            result = round_tasks[-1].output
+        else:
+            with round_graph.wire_context(round_tasks):
+                result = build_crew(round_tasks).kickoff()
         
         # Add result to conversation history
         conversation_history.append({"type": "result", "content": result})
@@ -407,11 +489,79 @@ def create_memory_tool(memory_store):
 # Make run_interactive_crew available for import in main.py
 result = "Run main.py to start the interactive CrewAI simulation"
 
-def run_crewsurfai_pipeline(tools_dict=None):
+@contextmanager
+def checkpoint_tasks(tasks, store, resume=False, manager=None, graph=None):
+    """Restore reusable task outputs from a run store and checkpoint the rest as they complete
+    
+    The checkpoint callbacks are removed again when the block exits, so the
+    shared Task objects keep their own callbacks however often the pipeline runs.
+    
+    Args:
+        tasks: Pipeline tasks in execution order
+        store: RunStore for this run
+        resume: Reuse checkpointed outputs whose inputs haven't changed
+        manager: Manager agent of the crew
+        graph: TaskGraph the tasks run by, or None when each task sees all tasks before it
+        
+    Yields:
+        The tasks that still have to run
+    """
+    from crewai.tasks.task_output import TaskOutput
+    
+    def dependencies(index):
+        if graph is None:
+            return range(index)
+        return [tasks.index(d) for d in graph.dependencies(tasks[index]) if d in tasks]
+    
+    completed = store.reusable(tasks, manager, dependencies) if resume else {}
+    for index, record in completed.items():
+        tasks[index].output = TaskOutput(description=tasks[index].description,
+                                         raw=record["output"], agent=record["agent"])
+    if completed:
+        print(f"Resuming run {store.run_id}: reusing {len(completed)} of {len(tasks)} completed tasks")
+    
+    run_tasks = list(tasks)  # The task objects that produce each output in this run
+    remaining = []
+    wrapped = []  # (task, callback to restore)
+    for index, task in enumerate(tasks):
+        if index in completed:
+            continue
+        if completed and graph is None:
+            # Tasks only see outputs produced in the same kickoff by default, so run
+            # a copy pointed at the restored ones rather than changing the shared task
+            task = task.model_copy(update={"context": run_tasks[:index]})
+            run_tasks[index] = task
+        remaining.append(task)
+        
+        # Chain to the task's own callback, never to a checkpoint left by an earlier run
+        original = getattr(task.callback, "checkpoint_original", task.callback)
+        
+        def save_checkpoint(output, index=index, task=task, callback=original):
+            inputs = task_inputs(task, [run_tasks[i].output.raw for i in dependencies(index)], manager)
+            store.save(index, task, inputs, output.raw, output.agent)
+            if callback:
+                callback(output)
+        
+        save_checkpoint.checkpoint_original = original
+        wrapped.append((task, original))
+        task.callback = save_checkpoint
+    try:
+        yield remaining
+    finally:
+        for task, callback in wrapped:
+            task.callback = callback
+
+def run_crewsurfai_pipeline(tools_dict=None, resume=False, run_id=None, parallel=PARALLEL_TASK_EXECUTION):
     """Run the CrewSurfAI pipeline with a team of agents
     
+    Each task's output is checkpointed to PIPELINE_RUN_DIR as it completes.
+    
     Args:
         tools_dict: Dictionary of tools to add to agents
+        resume: Continue a previous run, skipping completed tasks whose inputs haven't changed
+        run_id: Run to resume, the most recent one by default
+        parallel: Run independent tasks concurrently along task_graph instead of
+                  one at a time under the Director (tasks are then not delegated)
     """
     # Override default OpenAI embeddings with Ollama
     try:
@@ -555,36 +705,71 @@ def run_crewsurfai_pipeline(tools_dict=None):
     if tools_dict and 'memory_tool' in tools_dict:
         print("Added memory tool to SeniorPrincipalEngineer")
         
-    # Create the Crew with the agents that have tools properly assigned
-    crewsurfai_team = Crew(
-        agents=[chief_executive_officer, director, chief_architect, 
-                senior_principal_engineer, software_engineer_in_test, 
-                master_debugger, head_of_software_quality, 
-                technical_writer, staff_engineer],
-        tasks=[task_customer_oversight, task_team_management, 
-               task_architecture_planning, task_code_implementation, 
-               task_code_testing, task_debugging, 
-               task_quality_assurance, task_documentation],
-        process=Process.hierarchical,
-        manager=director,
-        manager_llm=pipeline_manager_llm,  # Added manager_llm for hierarchical process
-        memory=False,  # Disable memory to avoid ChromaDB API issues
-        verbose=True
-    )
-    
-    # Print configuration
-    print("\n=== CrewSurfAI Team Configuration ===")
-    print(f"Team size: {len(crewsurfai_team.agents)} agents")
-    print(f"Tasks: {len(crewsurfai_team.tasks)} main workflow tasks")
-    print(f"Process: {crewsurfai_team.process}")
-    
-    # Run the crew and get the result
-    try:
-        print("\n=== Starting CrewSurfAI Pipeline ===")
-        result = crewsurfai_team.kickoff()
-        print("\n=== CrewSurfAI Pipeline Complete ===")
-        print(f"Result: {result}")
-        return result
-    except Exception as e:
-        print(f"\nError in CrewSurfAI pipeline: {str(e)}")
-        raise
\ No newline at end of file
+    pipeline_tasks = [task_customer_oversight, task_team_management, 
+                      task_architecture_planning, task_staff_engineering,
+                      task_code_implementation, 
+                      task_code_testing, task_debugging, 
+                      task_quality_assurance, task_documentation]
+    ordered_tasks = task_graph.topological_order(pipeline_tasks) if parallel else pipeline_tasks
+    
+    # Checkpoint each task as it completes, and on resume skip the ones that are done
+    store = None
+    if resume:
+        store = RunStore(PIPELINE_RUN_DIR, run_id) if run_id else RunStore.latest(PIPELINE_RUN_DIR)
+        if store is None:
+            print("No previous run to resume - starting a new one")
+    store = store or RunStore(PIPELINE_RUN_DIR)
+    with checkpoint_tasks(ordered_tasks, store, resume=resume,
+                          manager=None if parallel else director,
+                          graph=task_graph if parallel else None) as remaining_tasks:
+        if not remaining_tasks:
+            result = pipeline_tasks[-1].output
+            print(f"\n=== All tasks of run {store.run_id} already completed ===")
+            print(f"Result: {result}")
+            return result
+        
+        pipeline_agents = [chief_executive_officer, director, chief_architect, 
+                           senior_principal_engineer, software_engineer_in_test, 
+                           master_debugger, head_of_software_quality, 
+                           technical_writer, staff_engineer]
+        
+        if parallel:
+            # No manager: each task runs on its agent once its dependencies are done
+            executor = TaskGraphExecutor(task_graph, MODEL_CONCURRENCY, agents=pipeline_agents)
+            process = f"parallel task graph, up to {MODEL_CONCURRENCY} tasks at once"
+        
+            def kickoff():
+                executor.run(remaining_tasks)
+                return pipeline_tasks[-1].output
+        else:
+            # Create the Crew with the agents that have tools properly assigned
+            crewsurfai_team = Crew(
+                agents=pipeline_agents,
+                tasks=remaining_tasks,
+                process=Process.hierarchical,
+                manager=director,
+                manager_llm=pipeline_manager_llm,  # Added manager_llm for hierarchical process
+                memory=False,  # Disable memory to avoid ChromaDB API issues
+                verbose=True
+            )
+            process = crewsurfai_team.process
+            kickoff = crewsurfai_team.kickoff
+        
+        # Print configuration
+        print("\n=== CrewSurfAI Team Configuration ===")
+        print(f"Team size: {len(pipeline_agents)} agents")
+        print(f"Tasks: {len(remaining_tasks)} main workflow tasks")
+        print(f"Process: {process}")
+        print(f"Checkpoints: {store.path}")
+        
+        # Run the crew and get the result
+        try:
+            print("\n=== Starting CrewSurfAI Pipeline ===")
+            result = kickoff()
+            print("\n=== CrewSurfAI Pipeline Complete ===")
+            print(f"Result: {result}")
+            return result
+        except Exception as e:
+            print(f"\nError in CrewSurfAI pipeline: {str(e)}")
+            print(f"Completed tasks are checkpointed in {store.path} - resume with --resume {store.run_id}")
+            raise
\ No newline at end of file
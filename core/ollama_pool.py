@@ -0,0 +1,220 @@
+"""
+Ollama endpoint pool for CrewSurf
+
+Routes requests across every server in OLLAMA_BASE_URLS using
+least-outstanding-requests selection. Servers that fail are taken out of
+rotation and health-checked again after a cooldown, and failed requests are
+retried on the next available server.
+"""
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+from langchain_core.language_models.llms import BaseLLM
+from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+from langchain_core.outputs import GenerationChunk, LLMResult
+
+from core.config.llm_config import OLLAMA_BASE_URLS
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the server is unreachable rather than the request being bad
+CONNECTION_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, ConnectionError, TimeoutError)
+
+
+def is_server_error(error) -> bool:
+    """True if an exception carries a 5xx status, i.e. the server failed rather than the request"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and status >= 500
+
+
+class OllamaEndpoint:
+    """State for a single Ollama server"""
+
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.healthy = True
+        self.failures = 0
+        self.last_failure = 0.0
+
+
+class OllamaEndpointPool:
+    """
+    Least-outstanding-requests router over a set of Ollama servers.
+
+    Each request goes to the healthy server with the fewest requests in flight.
+    A server that fails is marked unhealthy and skipped until its cooldown has
+    passed and a /api/tags health check succeeds again.
+    """
+
+    def __init__(self, urls, failure_cooldown=15.0, health_timeout=2.0):
+        """
+        Args:
+            urls: Base URLs of the Ollama servers
+            failure_cooldown: Seconds to wait before re-checking a failed server
+            health_timeout: Timeout in seconds for a health check request
+        """
+        if not urls:
+            raise ValueError("OllamaEndpointPool needs at least one URL")
+        self.endpoints = [OllamaEndpoint(url) for url in urls]
+        self.failure_cooldown = failure_cooldown
+        self.health_timeout = health_timeout
+        self._lock = threading.Lock()
+
+    @property
+    def urls(self) -> List[str]:
+        return [endpoint.url for endpoint in self.endpoints]
+
+    def check_health(self, endpoint: OllamaEndpoint) -> bool:
+        """Probe a server and update its health state"""
+        try:
+            response = requests.get(f"{endpoint.url}/api/tags", timeout=self.health_timeout)
+            healthy = response.status_code == 200
+        except requests.exceptions.RequestException:
+            healthy = False
+
+        with self._lock:
+            endpoint.healthy = healthy
+            if healthy:
+                endpoint.failures = 0
+            else:
+                endpoint.last_failure = time.monotonic()
+        if healthy:
+            logger.info(f"Ollama endpoint {endpoint.url} is healthy")
+        return healthy
+
+    def check_all(self) -> Dict[str, bool]:
+        """Health-check every server, e.g. at startup"""
+        return {endpoint.url: self.check_health(endpoint) for endpoint in self.endpoints}
+
+    def mark_failed(self, url: str) -> None:
+        """Take a server out of rotation after a failed request"""
+        with self._lock:
+            for endpoint in self.endpoints:
+                if endpoint.url == url:
+                    endpoint.healthy = False
+                    endpoint.failures += 1
+                    endpoint.last_failure = time.monotonic()
+                    logger.warning(f"Ollama endpoint {url} failed ({endpoint.failures} consecutive failures)")
+
+    def _pick(self, exclude=()) -> Optional[OllamaEndpoint]:
+        """Choose the healthy server with the fewest outstanding requests"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.url not in exclude]
+            recheck = [e for e in candidates
+                       if not e.healthy and now - e.last_failure >= self.failure_cooldown]
+
+        # Re-check servers whose cooldown has expired outside the lock
+        for endpoint in recheck:
+            self.check_health(endpoint)
+
+        with self._lock:
+            healthy = [e for e in candidates if e.healthy]
+            if not healthy:
+                # Nothing known to be healthy - try the least recently failed server
+                if not candidates:
+                    return None
+                endpoint = min(candidates, key=lambda e: e.last_failure)
+            else:
+                endpoint = min(healthy, key=lambda e: e.outstanding)
+            endpoint.outstanding += 1
+            return endpoint
+
+    @contextmanager
+    def acquire(self, exclude=()) -> Iterator[str]:
+        """Reserve a server for the duration of one request and yield its URL"""
+        endpoint = self._pick(exclude)
+        if endpoint is None:
+            raise RuntimeError("No Ollama endpoints available")
+        try:
+            yield endpoint.url
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+
+    def call(self, fn, retry_on=CONNECTION_ERRORS):
+        """
+        Run fn(url) against the pool, failing over to other servers
+
+        Args:
+            fn: Callable taking a base URL and performing the request
+            retry_on: Exception types that mark the server as failed and trigger failover;
+                      errors carrying a 5xx status do so as well
+
+        Returns:
+            The result of fn
+        """
+        tried = set()
+        last_error = None
+        while len(tried) < len(self.endpoints):
+            with self.acquire(exclude=tried) as url:
+                tried.add(url)
+                try:
+                    return fn(url)
+                except Exception as e:
+                    if not isinstance(e, retry_on) and not is_server_error(e):
+                        raise
+                    last_error = e
+                    self.mark_failed(url)
+                    logger.warning(f"Request to {url} failed, trying next endpoint: {e}")
+        raise last_error
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_ollama_pool() -> OllamaEndpointPool:
+    """Get the process-wide endpoint pool built from OLLAMA_BASE_URLS"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = OllamaEndpointPool(OLLAMA_BASE_URLS)
+    return _pool
+
+
+class PooledOllamaLLM(BaseLLM):
+    """
+    LangChain LLM that spreads generations over several Ollama servers.
+
+    Holds one Ollama client per server and sends each call to the server
+    chosen by the endpoint pool, retrying on another server if it is down.
+    """
+
+    clients: Dict[str, Any]
+    pool: Any
+
+    @property
+    def _llm_type(self) -> str:
+        """Return type of LLM."""
+        return "pooled_ollama"
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        return self.pool.call(
+            lambda url: self.clients[url]._generate(prompts, stop=stop, run_manager=run_manager, **kwargs)
+        )
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        # Failover is not possible once tokens have been yielded, so just route the stream
+        with self.pool.acquire() as url:
+            yield from self.clients[url]._stream(prompt, stop=stop, run_manager=run_manager, **kwargs)
@@ -0,0 +1,165 @@
+"""
+Batched and cached embeddings for the LiteLLM patch
+
+CrewAI embeds tool descriptions and knowledge one call at a time. This module
+coalesces embedding requests that arrive within a short window into a single
+batched Ollama call, shares in-flight work between identical texts, and serves
+repeated texts from a content-hash cache.
+"""
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class _Slot:
+    """Result placeholder for one text waiting to be embedded"""
+
+    __slots__ = ("event", "vector", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.vector = None
+        self.error = None
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests per model.
+
+    The first thread to submit an uncached text becomes the leader: it waits
+    for the batching window, takes every text queued for that model in the
+    meantime and embeds them with a single call. Other threads wait for their
+    results. Vectors are cached by a hash of the model name and text.
+    """
+
+    def __init__(self, embed_batch, window=0.01, max_batch_size=64, cache_size=4096, report_every=50):
+        """
+        Args:
+            embed_batch: Function taking (model, list of texts) and returning a list of vectors
+            window: Seconds to wait for more requests before sending a batch
+            max_batch_size: Maximum number of texts in one call
+            cache_size: Number of vectors kept in the cache
+            report_every: Log batching statistics every this many batches
+        """
+        self.embed_batch = embed_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.cache_size = cache_size
+        self.report_every = report_every
+        self._cache = OrderedDict()
+        self._pending = {}    # model -> list of (key, text, slot)
+        self._inflight = {}   # key -> slot
+        self._leaders = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.batched_texts = 0
+
+    @staticmethod
+    def _key(model, text):
+        return hashlib.sha1(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed(self, model, texts):
+        """
+        Embed a list of texts
+
+        Args:
+            model: Embedding model name
+            texts: List of strings
+
+        Returns:
+            List of vectors in the same order as texts
+        """
+        results = [None] * len(texts)
+        waiting = []
+        lead = False
+
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = self._key(model, text)
+                vector = self._cache.get(key)
+                if vector is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    results[i] = vector
+                    continue
+
+                self.misses += 1
+                slot = self._inflight.get(key)
+                if slot is None:
+                    # Nobody is embedding this text yet - queue it
+                    slot = self._inflight[key] = _Slot()
+                    self._pending.setdefault(model, []).append((key, text, slot))
+                waiting.append((i, slot))
+
+            if waiting and model in self._pending and model not in self._leaders:
+                self._leaders.add(model)
+                lead = True
+
+        if lead:
+            self._lead(model)
+
+        for i, slot in waiting:
+            slot.event.wait()
+            if slot.error is not None:
+                raise slot.error
+            results[i] = slot.vector
+        return results
+
+    def _lead(self, model):
+        """Collect queued texts for a model and embed them in batches"""
+        time.sleep(self.window)
+        with self._lock:
+            queued = self._pending.pop(model, [])
+            self._leaders.discard(model)
+
+        for start in range(0, len(queued), self.max_batch_size):
+            batch = queued[start:start + self.max_batch_size]
+            try:
+                vectors = self.embed_batch(model, [text for _, text, _ in batch])
+                error = None
+            except Exception as e:
+                vectors, error = None, e
+
+            with self._lock:
+                for n, (key, _, slot) in enumerate(batch):
+                    self._inflight.pop(key, None)
+                    if error is None:
+                        slot.vector = vectors[n]
+                        self._cache[key] = slot.vector
+                    else:
+                        slot.error = error
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                self.batches += 1
+                self.batched_texts += len(batch)
+                report = self.batches % self.report_every == 0
+
+            for _, _, slot in batch:
+                slot.event.set()
+            if report:
+                self._report()
+
+    def stats(self):
+        """Return batching and cache statistics as a dictionary"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "batches": self.batches,
+                "average_batch_size": self.batched_texts / self.batches if self.batches else 0.0,
+                "cache_hits": self.hits,
+                "cache_misses": self.misses,
+                "cache_hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _report(self):
+        stats = self.stats()
+        logger.info(
+            f"Embeddings: {stats['batches']} batches, average size {stats['average_batch_size']:.1f}, "
+            f"cache hit rate {stats['cache_hit_rate']:.0%}"
+        )
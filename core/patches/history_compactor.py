@@ -0,0 +1,188 @@
+"""
+Conversation history compaction for the LiteLLM patch
+
+Agent scratchpads grow with every ReAct iteration, and each completion resends
+the whole history, so prefill time climbs until the context overflows. Once a
+conversation crosses a token threshold, this module keeps the system prompt,
+the task message and the last N messages verbatim, and replaces older messages
+with summaries. Older messages are summarized in fixed-size chunks and each
+chunk's summary is cached, so a chunk is only ever summarized once.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import requests
+
+from core.config.llm_config import OLLAMA_KEEP_ALIVE
+from core.patches.prompt_cache_stats import estimate_prompt_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "Summarize the following part of an AI agent's working conversation. Keep decisions, "
+    "facts learned, tool results that matter and open questions. Be concise.\n\n{conversation}"
+)
+
+
+def extractive_summary(messages, max_chars=200):
+    """Summarize messages by keeping the start of each one, used when no model is available"""
+    lines = []
+    for msg in messages:
+        content = str(msg.get("content") or "").strip().replace("\n", " ")
+        if len(content) > max_chars:
+            content = content[:max_chars] + "..."
+        lines.append(f"{msg.get('role', 'unknown')}: {content}")
+    return "\n".join(lines)
+
+
+def ollama_summarizer(model, base_url=None, timeout=120, keep_alive=OLLAMA_KEEP_ALIVE):
+    """
+    Create a summarize function that asks an Ollama model for the summary
+
+    Args:
+        model: Ollama model name without provider prefix
+        base_url: Ollama server to use, or None to route through the endpoint pool
+        timeout: Request timeout in seconds
+        keep_alive: How long Ollama keeps the summary model loaded afterwards
+
+    Returns:
+        Function taking a list of messages and returning a summary string
+    """
+    def summarize(messages):
+        conversation = "\n\n".join(f"{msg.get('role', 'unknown')}: {msg.get('content') or ''}" for msg in messages)
+        payload = {"model": model, "prompt": SUMMARY_PROMPT.format(conversation=conversation), "stream": False,
+                   "keep_alive": keep_alive}
+
+        def send(url):
+            response = requests.post(f"{url}/api/generate", json=payload, timeout=timeout)
+            response.raise_for_status()
+            return response.json().get("response", "").strip()
+
+        if base_url:
+            return send(base_url)
+        from core.ollama_pool import get_ollama_pool
+        return get_ollama_pool().call(send)
+
+    return summarize
+
+
+class HistoryCompactor:
+    """
+    Replaces older conversation messages with cached chunk summaries.
+
+    Messages are left untouched until their estimated size exceeds
+    token_threshold. Tool results are never separated from the assistant
+    message that requested them.
+    """
+
+    def __init__(self, token_threshold=6000, keep_last_messages=6, chunk_messages=4,
+                 summarize=None, max_summaries=256):
+        """
+        Args:
+            token_threshold: Estimated prompt size in tokens that triggers compaction
+            keep_last_messages: Number of most recent messages kept verbatim
+            chunk_messages: Number of older messages summarized together
+            summarize: Function turning a list of messages into a summary string,
+                       defaults to extractive_summary
+            max_summaries: Number of chunk summaries kept in the cache
+        """
+        if keep_last_messages < 1:
+            raise ValueError("keep_last_messages must be at least 1")
+        if chunk_messages < 1:
+            raise ValueError("chunk_messages must be at least 1")
+        self.token_threshold = token_threshold
+        self.keep_last_messages = keep_last_messages
+        self.chunk_messages = chunk_messages
+        self.summarize = summarize or extractive_summary
+        self.max_summaries = max_summaries
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _chunk_key(chunk):
+        digest = hashlib.sha1()
+        for msg in chunk:
+            digest.update(str(msg.get("role", "")).encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(str(msg.get("content") or "").encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _summarize_chunk(self, chunk):
+        """Return the cached summary of a chunk, creating it if needed"""
+        key = self._chunk_key(chunk)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is not None:
+                self._summaries.move_to_end(key)
+                return summary
+
+        try:
+            summary = self.summarize(chunk)
+        except Exception as e:
+            logger.warning(f"Summarizer failed, using extractive summary: {e}")
+            summary = extractive_summary(chunk)
+
+        with self._lock:
+            self._summaries[key] = summary
+            while len(self._summaries) > self.max_summaries:
+                self._summaries.popitem(last=False)
+        return summary
+
+    def compact(self, messages):
+        """
+        Compact a message list if it is over the token threshold
+
+        Args:
+            messages: List of chat message dicts
+
+        Returns:
+            The original list, or a new shorter list with older messages summarized
+        """
+        if not messages:
+            return messages
+        before = estimate_prompt_tokens(messages)
+        if before <= self.token_threshold:
+            return messages
+
+        # Keep the system prompt(s) and the first task message verbatim
+        head = 0
+        while head < len(messages) and isinstance(messages[head], dict) and messages[head].get("role") == "system":
+            head += 1
+        head = min(head + 1, len(messages))
+
+        # Keep the last messages verbatim, without splitting a tool result from its call
+        tail = max(head, len(messages) - self.keep_last_messages)
+        while tail > head and isinstance(messages[tail], dict) and messages[tail].get("role") == "tool":
+            tail -= 1
+
+        middle = [msg for msg in messages[head:tail] if isinstance(msg, dict)]
+
+        # Summarize only complete chunks so chunk boundaries, and cached summaries, stay
+        # stable. A chunk is extended to take in tool results for its last tool call
+        summaries = []
+        start = 0
+        while start + self.chunk_messages <= len(middle):
+            end = start + self.chunk_messages
+            while end < len(middle) and middle[end].get("role") == "tool":
+                end += 1
+            summaries.append(self._summarize_chunk(middle[start:end]))
+            start = end
+        if not summaries:
+            return messages
+        remainder = middle[start:]
+
+        summary_message = {
+            "role": "user",
+            "content": "Summary of earlier conversation:\n\n" + "\n\n".join(summaries),
+        }
+        compacted = list(messages[:head]) + [summary_message] + remainder + list(messages[tail:])
+
+        after = estimate_prompt_tokens(compacted)
+        logger.info(
+            f"Compacted conversation history: ~{before} -> ~{after} prompt tokens "
+            f"({start} older messages summarized)"
+        )
+        return compacted
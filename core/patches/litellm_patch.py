@@ -3,25 +3,56 @@ LiteLLM Patch for Ollama tool calls issues
 
 This module contains monkey patches for known issues with LiteLLM's Ollama integration,
 specifically around tool calling support which causes index errors.
+
+Importing this module is cheap: it only installs an import hook, and the patches are
+applied the first time litellm itself is imported (or immediately if it already is).
+Commands that never touch a model therefore don't pay for importing litellm.
 """
 import os
 import sys
 import logging
+import threading
+import importlib.abc
+import importlib.util
 from functools import wraps
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Patching state - patch_litellm() only does its work once per process
+_patched = False
+_patch_lock = threading.RLock()
+
 def patch_litellm():
     """
     Apply patches to LiteLLM to fix common issues with the Ollama integration,
     particularly around tool calls which cause index errors.
+    
+    Safe to call any number of times; only the first successful call does any work.
     """
+    global _patched
+    if _patched:
+        return True
+    
+    with _patch_lock:
+        if _patched:
+            return True
+        _patched = _apply_patches()
+        if _patched:
+            logger.info("LiteLLM patches applied successfully")
+        else:
+            logger.error("Failed to apply LiteLLM patches")
+        return _patched
+
+def _apply_patches():
+    """Apply all LiteLLM patches, returning True on success"""
     try:
+        from core.config.llm_config import OLLAMA_BASE_URL, EMBEDDING_MODEL_NAME, OLLAMA_KEEP_ALIVE
+        
         # Disable OpenAI API usage completely to prevent fallbacks
         os.environ["OPENAI_API_KEY"] = ""
-        os.environ["OPENAI_API_BASE"] = "http://localhost:11434"  # Redirect to Ollama
+        os.environ["OPENAI_API_BASE"] = OLLAMA_BASE_URL  # Redirect to Ollama
         os.environ["LANGCHAIN_TRACING"] = "false"
         os.environ["CREWAI_FORCE_LOCAL_EMBEDDINGS"] = "true"
         os.environ["LANGCHAIN_OPENAI_API_KEY"] = ""
@@ -33,168 +64,52 @@ def patch_litellm():
         os.environ["CHROMA_OPENAI_API_KEY"] = "not-needed-using-local-embeddings"
         
         # Force CrewAI to use local embeddings
-        os.environ["CREW_EMBEDDING_MODEL"] = "ollama/nomic-embed-text"
-        os.environ["CREW_EMBEDDING_BASE_URL"] = "http://localhost:11434"
+        os.environ["CREW_EMBEDDING_MODEL"] = f"ollama/{EMBEDDING_MODEL_NAME}"
+        os.environ["CREW_EMBEDDING_BASE_URL"] = OLLAMA_BASE_URL
         
         # Import liteLLM modules for patching
         import litellm
+        
+        # Put these back if a patch fails, so a retry wraps the real functions again
+        original_functions = {name: getattr(litellm, name) for name in ("completion", "embedding")}
+        from core.ollama_pool import get_ollama_pool, CONNECTION_ERRORS
+        
+        # Route Ollama calls across every configured server, failing over on connection errors
+        ollama_pool = get_ollama_pool()
+        failover_errors = CONNECTION_ERRORS + (
+            litellm.exceptions.APIConnectionError,
+            litellm.exceptions.Timeout,
+            litellm.exceptions.ServiceUnavailableError,
+        )
+        
+        def call_with_pool(original, args, kwargs):
+            """Send an Ollama call to the least-loaded server in the pool"""
+            def send(url):
+                return original(*args, **dict(kwargs, api_base=url))
+            return ollama_pool.call(send, retry_on=failover_errors)
+        
         from litellm.litellm_core_utils.prompt_templates.factory import ollama_pt
         
         # Keep track of original function
         original_ollama_pt = ollama_pt
         
+        # Single-pass prompt builder that caches the rendered prefix of each conversation
+        from core.patches.prompt_compiler import OllamaPromptCompiler, DEFAULT_PROMPT
+        prompt_compiler = OllamaPromptCompiler()
+        
         # Define completely new, safe implementation of ollama_pt
         def patched_ollama_pt(model, messages, custom_llm_provider=None, **kwargs):
             """
             Completely rewritten ollama_pt function to properly handle tool calls and prevent index errors.
             This handles all message formats and produces Ollama-compatible prompts.
             """
-            # Create a default fallback prompt in case of any errors
-            default_prompt = "<user>\nHelp me\n</user>"
-            
             try:
-                # Safety check for empty messages
-                if not messages:
-                    logger.warning("Empty messages list in ollama_pt, returning default prompt")
-                    return default_prompt
-                
-                # Log message information for debugging
-                logger.info(f"Patched ollama_pt called with {len(messages)} messages")
-                
-                # Create a clean list of valid dict messages - defensive coding
-                clean_messages = []
-                for msg in messages:
-                    if isinstance(msg, dict):
-                        clean_messages.append(dict(msg))  # Create a clean copy
-                    else:
-                        logger.warning(f"Skipping non-dict message of type: {type(msg)}")
-                
-                # If we have no valid messages, return default
-                if not clean_messages:
-                    logger.warning("No valid messages found")
-                    return default_prompt
-                
-                # Build prompt in Ollama format
-                # Extract system prompt if present
-                system = ""
-                system_messages = []
-                user_assistant_messages = []
-                
-                # Separate system messages from other messages
-                for msg in clean_messages:
-                    if msg.get("role", "") == "system":
-                        system_content = msg.get("content") or ""
-                        if system_content:
-                            system += system_content
-                            system_messages.append(msg)
-                    else:
-                        user_assistant_messages.append(msg)
-                        
-                result = ""
-                if system:
-                    result += f"<system>\n{system}\n</system>\n\n"
-                    
-                # Process user/assistant messages in sequence
-                # Safety check to avoid index errors
-                if not user_assistant_messages:
-                    logger.warning("No user or assistant messages to process")
-                    if result:  # If we at least have a system message
-                        result += f"<user>\nHelp me\n</user>"
-                        return result
-                    else:
-                        return default_prompt
-                
-                # Process messages in pairs (user/assistant)
-                prompt_messages = []
-                for i, msg in enumerate(user_assistant_messages):
-                    role = msg.get("role", "").lower()
-                    content = msg.get("content")
-                    if content is None:  # Handle None content
-                        content = ""
-                        
-                    # Handle tool calls safely - this is where the index error happened
-                    tool_calls = None
-                    try:
-                        # Safely get tool_calls with multiple fallback options
-                        if "tool_calls" in msg:
-                            tool_calls = msg.get("tool_calls")
-                        elif "function_call" in msg:
-                            # Handle legacy function call format
-                            function_call = msg.get("function_call")
-                            if function_call:
-                                tool_calls = [{
-                                    "type": "function",
-                                    "function": function_call
-                                }]
-                    except Exception as e:
-                        logger.warning(f"Error extracting tool_calls: {e}")
-                        tool_calls = None
-
-                    # Process different roles
-                    if role == "user":
-                        result += f"<user>\n{content}\n</user>\n"
-                    elif role == "assistant":
-                        # Add assistant message content
-                        result += f"<assistant>\n{content}"
-                        
-                        # Safe handling of tool_calls - this was the source of the index error
-                        if tool_calls is not None and isinstance(tool_calls, list) and len(tool_calls) > 0:
-                            try:
-                                # Process each tool call safely
-                                for tool_call in tool_calls:
-                                    if not isinstance(tool_call, dict):
-                                        continue  # Skip non-dict tool calls
-                                        
-                                    # Extract function name and arguments
-                                    function_data = None
-                                    
-                                    # Try different possible structures
-                                    if "function" in tool_call and isinstance(tool_call["function"], dict):
-                                        function_data = tool_call["function"]
-                                    elif "function_call" in tool_call and isinstance(tool_call["function_call"], dict):
-                                        function_data = tool_call["function_call"]
-                                        
-                                    if function_data:
-                                        fn_name = function_data.get("name", "")
-                                        fn_args = function_data.get("arguments", "{}")
-                                        if fn_name:
-                                            # Format tool call for Ollama
-                                            result += f"\n<tool_call>\n<tool_name>{fn_name}</tool_name>\n<tool_input>{fn_args}</tool_input>\n</tool_call>"
-                            except Exception as e:
-                                logger.warning(f"Error processing tool calls: {e}")
-                                
-                        # Close assistant tag
-                        result += "\n</assistant>\n"
-                        
-                # Add tool_result messages if present
-                for msg in user_assistant_messages:
-                    if msg.get("role", "").lower() == "tool":
-                        tool_name = msg.get("name", "")
-                        content = msg.get("content", "")
-                        if tool_name and content:
-                            result += f"<tool_result>\n<tool_name>{tool_name}</tool_name>\n<tool_result_value>{content}</tool_result_value>\n</tool_result>\n"
-                            
-                # Return the final formatted prompt
-                logger.info(f"Successfully created Ollama prompt with length {len(result)}")
-                return result
-                
+                return prompt_compiler.compile(messages)
             except Exception as e:
+                # Don't fall back to the original function - it has the bug!
                 # Log the error and return a safe default prompt
                 logger.error(f"Error in patched_ollama_pt: {str(e)}")
-                return default_prompt
-                return result
-                    
-            except Exception as e:
-                logger.error(f"Error in patched_ollama_pt: {str(e)}")
-                try:
-                    # Don't fall back to original function if our patch fails - it has the bug!
-                    # Return a minimal working prompt as last resort
-                    logger.info("Patched ollama_pt failed, returning minimal prompt")
-                    return "<user>\nHelp me\n</user>"
-                except Exception as inner_e:
-                    logger.error(f"Both patched and original ollama_pt failed: {str(inner_e)}")
-                    # Return minimal working prompt as last resort
-                    return "<user>\nHelp me\n</user>"
+                return DEFAULT_PROMPT
         
         # Apply the patch by replacing the function everywhere it's used
         logger.info("Applying patch for ollama_pt in LiteLLM")
@@ -241,37 +156,109 @@ def patch_litellm():
         except Exception as e:
             logger.error(f"Failed to patch Ollama integration: {str(e)}")
         
+        # LiteLLM puts unknown parameters of /api/generate requests into "options",
+        # where Ollama ignores keep_alive - send it as a top-level field instead
+        from litellm.llms.ollama.completion.transformation import OllamaConfig
+        original_transform_request = OllamaConfig.transform_request
+        
+        @wraps(original_transform_request)
+        def transform_request(self, model, messages, optional_params, litellm_params, headers):
+            keep_alive = optional_params.pop("keep_alive", None)
+            data = original_transform_request(self, model, messages, optional_params, litellm_params, headers)
+            if keep_alive is not None:
+                data["keep_alive"] = keep_alive
+            return data
+        
+        if not getattr(original_transform_request, "sends_keep_alive", False):
+            transform_request.sends_keep_alive = True
+            OllamaConfig.transform_request = transform_request
+        
         # Also patch embedding to avoid OpenAI API calls
         def patch_embeddings():
+            """Route embeddings through the batcher and pool, returning True on success"""
             try:
+                from core.patches.embedding_batcher import EmbeddingBatcher
+                
                 # Save original embedding function
                 original_embedding = litellm.embedding
                 
+                def embed_batch(model, texts):
+                    """Embed a batch of texts with one pooled Ollama call"""
+                    response = call_with_pool(original_embedding, (),
+                                              {"model": model, "input": texts, "keep_alive": OLLAMA_KEEP_ALIVE})
+                    return [item["embedding"] if isinstance(item, dict) else item.embedding
+                            for item in response.data]
+                
+                # Coalesce concurrent embedding calls and cache repeated texts
+                embedding_batcher = EmbeddingBatcher(embed_batch)
+                
+                # Arguments that batching can handle - anything else is sent as-is
+                batchable_args = {"model", "input", "custom_llm_provider", "api_base", "keep_alive"}
+                
                 @wraps(original_embedding)
                 def safe_embedding(*args, **kwargs):
                     # Force all OpenAI embeddings to use local Ollama
                     if "model" in kwargs and isinstance(kwargs["model"], str):
                         if kwargs["model"].startswith("text-embedding"):
                             logger.info(f"Redirecting embedding call from {kwargs['model']} to Ollama")
-                            kwargs["model"] = "ollama/nomic-embed-text"
+                            kwargs["model"] = f"ollama/{EMBEDDING_MODEL_NAME}"
                             kwargs["custom_llm_provider"] = "ollama"
-                            kwargs["api_base"] = "http://localhost:11434"
+                            kwargs.pop("api_base", None)
+                        
+                        if kwargs["model"].startswith("ollama"):
+                            # Keep the embedding model resident like the chat models, instead
+                            # of resetting it to Ollama's default unload timeout on every call
+                            kwargs.setdefault("keep_alive", OLLAMA_KEEP_ALIVE)
+                        
+                        if kwargs["model"].startswith("ollama") and kwargs.get("api_base") in (None, OLLAMA_BASE_URL):
+                            texts = kwargs.get("input")
+                            if isinstance(texts, str):
+                                texts = [texts]
+                            if (not args and set(kwargs) <= batchable_args and isinstance(texts, list)
+                                    and kwargs["keep_alive"] == OLLAMA_KEEP_ALIVE
+                                    and all(isinstance(text, str) for text in texts)):
+                                vectors = embedding_batcher.embed(kwargs["model"], texts)
+                                return litellm.EmbeddingResponse(
+                                    model=kwargs["model"],
+                                    data=[{"object": "embedding", "index": i, "embedding": vector}
+                                          for i, vector in enumerate(vectors)],
+                                    usage=litellm.Usage(prompt_tokens=0, completion_tokens=0, total_tokens=0)
+                                )
+                            return call_with_pool(original_embedding, args, kwargs)
                     
                     return original_embedding(*args, **kwargs)
                 
                 # Apply patch
                 litellm.embedding = safe_embedding
                 logger.info("Successfully patched LiteLLM embedding function")
+                return True
                 
             except Exception as e:
                 logger.error(f"Failed to patch embedding function: {str(e)}")
-        
-        # Apply embedding patch
-        patch_embeddings()
+                return False
         
         # Also patch completion to enforce Ollama instead of OpenAI
         def patch_completion():
+            """Route completions to Ollama through the pool, returning True on success"""
             try:
+                from core.config.llm_config import (
+                    OLLAMA_KEEP_ALIVE, OLLAMA_USE_CHAT_API, HISTORY_COMPACTION_ENABLED,
+                    HISTORY_TOKEN_THRESHOLD, HISTORY_KEEP_LAST_MESSAGES,
+                    HISTORY_SUMMARY_CHUNK_MESSAGES, HISTORY_SUMMARY_MODEL
+                )
+                from core.patches.prompt_cache_stats import prompt_cache_tracker
+                from core.patches.history_compactor import HistoryCompactor, ollama_summarizer
+                
+                # Keep long agent scratchpads from growing the prompt without bound
+                history_compactor = None
+                if HISTORY_COMPACTION_ENABLED:
+                    history_compactor = HistoryCompactor(
+                        token_threshold=HISTORY_TOKEN_THRESHOLD,
+                        keep_last_messages=HISTORY_KEEP_LAST_MESSAGES,
+                        chunk_messages=HISTORY_SUMMARY_CHUNK_MESSAGES,
+                        summarize=ollama_summarizer(HISTORY_SUMMARY_MODEL) if HISTORY_SUMMARY_MODEL else None
+                    )
+                
                 # Save original completion function
                 original_completion = litellm.completion
                 
@@ -288,29 +275,158 @@ def patch_litellm():
                             logger.info(f"Redirecting completion call from {kwargs.get('custom_llm_provider', 'unknown')}/{kwargs['model']} to Ollama qwen3")
                             kwargs["model"] = "ollama/qwen3"  # Use qwen3 as it's available on your server
                             kwargs["custom_llm_provider"] = "ollama"
-                            kwargs["api_base"] = "http://localhost:11434"
+                            kwargs.pop("api_base", None)
+                        
+                        if kwargs["model"].startswith("ollama"):
+                            # Keep the model resident between human responses instead of
+                            # falling back to Ollama's default unload timeout
+                            kwargs.setdefault("keep_alive", OLLAMA_KEEP_ALIVE)
+                            
+                            if history_compactor is not None and kwargs.get("messages"):
+                                kwargs["messages"] = history_compactor.compact(kwargs["messages"])
+                            
+                            # Optionally send structured messages and native tool definitions to
+                            # Ollama's chat endpoint instead of a prompt built by the compiler
+                            if OLLAMA_USE_CHAT_API and kwargs["model"].startswith("ollama/"):
+                                kwargs["model"] = "ollama_chat/" + kwargs["model"][len("ollama/"):]
+                                if kwargs.get("custom_llm_provider") == "ollama":
+                                    kwargs["custom_llm_provider"] = "ollama_chat"
+                            
+                            if kwargs.get("api_base") in (None, OLLAMA_BASE_URL):
+                                response = call_with_pool(original_completion, args, kwargs)
+                            else:
+                                response = original_completion(*args, **kwargs)
+                            
+                            # Track how much of the prompt Ollama served from its cache, from the
+                            # prompt_eval_count it reports against the tokenized prompt
+                            if kwargs.get("messages") and not kwargs.get("stream"):
+                                # No model name, so LiteLLM doesn't ask the server for model details
+                                prompt_tokens = litellm.token_counter(messages=kwargs["messages"])
+                                prompt_cache_tracker.record(kwargs["model"], prompt_tokens, response)
+                            return response
                     
                     return original_completion(*args, **kwargs)
                 
                 # Apply patch
                 litellm.completion = safe_completion
                 logger.info("Successfully patched LiteLLM completion function")
+                return True
                 
             except Exception as e:
                 logger.error(f"Failed to patch completion function: {str(e)}")
+                return False
         
-        # Apply completion patch
-        patch_completion()
-        
-        return True
+        # Apply the embedding and completion patches - both, or neither
+        if patch_embeddings() and patch_completion():
+            return True
+        for name, original in original_functions.items():
+            setattr(litellm, name, original)
+        return False
         
     except Exception as e:
         logger.error(f"Failed to patch LiteLLM: {str(e)}")
         return False
 
-# Automatically apply patches when imported
-success = patch_litellm()
-if success:
-    logger.info("LiteLLM patches applied successfully")
-else:
-    logger.error("Failed to apply LiteLLM patches")
\ No newline at end of file
+class _LiteLLMImportHook(importlib.abc.MetaPathFinder):
+    """
+    Meta path finder that applies the patches right after litellm is imported
+    
+    The hook stays installed until the patches have been applied. If patching
+    fails, it is retried on the first litellm.completion or litellm.embedding
+    call, up to MAX_PATCH_ATTEMPTS times, so a transient failure doesn't leave
+    the Ollama fixes off for the rest of the process.
+    """
+    
+    def __init__(self):
+        self._resolving = threading.local()
+    
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname != "litellm" or getattr(self._resolving, "active", False):
+            return None
+        
+        # Find the real spec with this hook out of the way, then wrap its loader
+        self._resolving.active = True
+        try:
+            spec = importlib.util.find_spec(fullname)
+        finally:
+            self._resolving.active = False
+        if spec is None or spec.loader is None or not hasattr(spec.loader, "exec_module"):
+            return spec
+        
+        exec_module = spec.loader.exec_module
+        
+        def exec_and_patch(module):
+            exec_module(module)
+            _patch_and_unhook()
+        
+        spec.loader.exec_module = exec_and_patch
+        return spec
+
+# Patching is retried on first use after a failure, but not forever
+MAX_PATCH_ATTEMPTS = 3
+_patch_attempts = 0
+
+def _patch_and_unhook():
+    """Patch litellm, removing the import hook once the patches are in place"""
+    global _patch_attempts
+    with _patch_lock:
+        if _patched:
+            remove_import_hook()
+            return True
+        _patch_attempts += 1
+        if patch_litellm():
+            remove_import_hook()
+            return True
+        if _patch_attempts >= MAX_PATCH_ATTEMPTS:
+            logger.error(f"Giving up on patching LiteLLM after {_patch_attempts} attempts")
+            remove_import_hook()
+        else:
+            _retry_on_first_use()
+        return False
+
+def _retry_on_first_use():
+    """Wrap litellm's entry points so the next call retries patching before running"""
+    import litellm
+    
+    originals = {name: getattr(litellm, name) for name in ("completion", "embedding")}
+    wrappers = {}
+    
+    def make_wrapper(name):
+        @wraps(originals[name])
+        def retry_patch_then_call(*args, **kwargs):
+            with _patch_lock:
+                if getattr(litellm, name) is wrappers[name]:
+                    # Put the real functions back first, so the patches wrap them and not us
+                    for original_name, original in originals.items():
+                        if getattr(litellm, original_name) is wrappers[original_name]:
+                            setattr(litellm, original_name, original)
+                    _patch_and_unhook()
+            return getattr(litellm, name)(*args, **kwargs)
+        return retry_patch_then_call
+    
+    for name in originals:
+        wrappers[name] = make_wrapper(name)
+        setattr(litellm, name, wrappers[name])
+
+_import_hook = _LiteLLMImportHook()
+
+def install_import_hook():
+    """
+    Arrange for patch_litellm() to run when litellm is first imported
+    
+    If litellm has already been imported the patches are applied immediately.
+    """
+    if _patched:
+        return
+    if "litellm" in sys.modules:
+        patch_litellm()
+    elif _import_hook not in sys.meta_path:
+        sys.meta_path.insert(0, _import_hook)
+
+def remove_import_hook():
+    """Remove the litellm import hook if it is installed"""
+    if _import_hook in sys.meta_path:
+        sys.meta_path.remove(_import_hook)
+
+# Defer patching until litellm is actually imported
+install_import_hook()
\ No newline at end of file
@@ -0,0 +1,86 @@
+"""
+Prompt cache reuse tracking for Ollama completions
+
+Ollama reports prompt_eval_count, the number of prompt tokens it actually had
+to process. When the KV cache from the previous turn is reused, that count only
+covers the new tail of the conversation. Comparing it with the tokenized size of
+the full prompt shows how much prefill each agent step is saving.
+
+estimate_prompt_tokens is a cheap size estimate for deciding when to compact
+history; the cache statistics don't use it.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used to estimate prompt size without a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_prompt_tokens(messages):
+    """Estimate the number of tokens in a list of chat messages"""
+    chars = 0
+    for msg in messages or []:
+        if isinstance(msg, dict):
+            content = msg.get("content")
+            if content:
+                chars += len(content) if isinstance(content, str) else len(str(content))
+    return max(1, chars // CHARS_PER_TOKEN)
+
+
+class PromptCacheTracker:
+    """Accumulates prompt-eval statistics across Ollama completions"""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.evaluated_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, model, prompt_tokens, response):
+        """
+        Record one completion response
+
+        Args:
+            model: Model name used for the call
+            prompt_tokens: Tokenizer count of the whole prompt that was sent
+            response: LiteLLM ModelResponse, whose usage.prompt_tokens is
+                      Ollama's prompt_eval_count for the call
+
+        Returns:
+            Fraction of the prompt served from the cache for this call, or None
+        """
+        usage = getattr(response, "usage", None)
+        evaluated = getattr(usage, "prompt_tokens", None) if usage is not None else None
+        if evaluated is None or not prompt_tokens:
+            return None
+
+        evaluated = min(evaluated, prompt_tokens)
+        reuse = 1.0 - evaluated / prompt_tokens
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.evaluated_tokens += evaluated
+            total_reuse = 1.0 - self.evaluated_tokens / self.prompt_tokens
+
+        logger.info(
+            f"{model}: evaluated {evaluated} of {prompt_tokens} prompt tokens "
+            f"({reuse:.0%} reused from cache, {total_reuse:.0%} over {self.calls} calls)"
+        )
+        return reuse
+
+    def summary(self):
+        """Return accumulated statistics as a dictionary"""
+        with self._lock:
+            reuse = 1.0 - self.evaluated_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "evaluated_prompt_tokens": self.evaluated_tokens,
+                "cache_reuse": reuse,
+            }
+
+
+# Shared tracker used by the LiteLLM completion patch
+prompt_cache_tracker = PromptCacheTracker()
@@ -0,0 +1,204 @@
+"""
+Ollama prompt compiler for the LiteLLM patch
+
+Renders chat messages into the <system>/<user>/<assistant> text format used by
+patched_ollama_pt in a single pass, keeping tool results in their original
+positions. ReAct loops resend the same growing history on every iteration, so
+the rendered prefix of each conversation is cached and only the new tail of
+messages is rendered on later calls.
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPT = "<user>\nHelp me\n</user>"
+
+
+def _get_tool_calls(msg):
+    """Get tool calls from a message, converting the legacy function_call format"""
+    if "tool_calls" in msg:
+        return msg.get("tool_calls")
+    function_call = msg.get("function_call")
+    if function_call:
+        return [{"type": "function", "function": function_call}]
+    return None
+
+
+def _fingerprint(msg):
+    """
+    Identify a message for prefix comparison.
+
+    The content string itself is kept rather than hashed: tuple comparison
+    short-circuits on identical objects, so resent history costs almost nothing
+    to compare, and strings are only scanned when they actually differ.
+    """
+    tool_calls = _get_tool_calls(msg)
+    content = msg.get("content")
+    return (
+        str(msg.get("role", "")).lower(),
+        content if content is None or isinstance(content, str) else repr(content),
+        msg.get("name"),
+        repr(tool_calls) if tool_calls else None,
+    )
+
+
+def _render_tool_calls(tool_calls, parts):
+    """Append tool calls of an assistant message to parts"""
+    if not isinstance(tool_calls, list):
+        return
+    for tool_call in tool_calls:
+        if not isinstance(tool_call, dict):
+            continue  # Skip non-dict tool calls
+
+        # Try different possible structures
+        function_data = None
+        if isinstance(tool_call.get("function"), dict):
+            function_data = tool_call["function"]
+        elif isinstance(tool_call.get("function_call"), dict):
+            function_data = tool_call["function_call"]
+
+        if function_data:
+            fn_name = function_data.get("name", "")
+            fn_args = function_data.get("arguments", "{}")
+            if fn_name:
+                parts.append(
+                    f"\n<tool_call>\n<tool_name>{fn_name}</tool_name>\n<tool_input>{fn_args}</tool_input>\n</tool_call>"
+                )
+
+
+def render_message(msg, parts):
+    """
+    Append the rendered form of one message to parts
+
+    Args:
+        msg: Message dict
+        parts: List of string parts to append to
+    """
+    role = msg.get("role", "").lower()
+    content = msg.get("content")
+    if content is None:
+        content = ""
+
+    if role == "system":
+        if content:
+            parts.append(f"<system>\n{content}\n</system>\n\n")
+    elif role == "user":
+        parts.append(f"<user>\n{content}\n</user>\n")
+    elif role == "assistant":
+        parts.append(f"<assistant>\n{content}")
+        try:
+            _render_tool_calls(_get_tool_calls(msg), parts)
+        except Exception as e:
+            logger.warning(f"Error processing tool calls: {e}")
+        parts.append("\n</assistant>\n")
+    elif role == "tool":
+        tool_name = msg.get("name", "")
+        if tool_name and content:
+            parts.append(
+                f"<tool_result>\n<tool_name>{tool_name}</tool_name>\n<tool_result_value>{content}</tool_result_value>\n</tool_result>\n"
+            )
+
+
+class _CompiledConversation:
+    """Rendered prefix of one conversation"""
+
+    __slots__ = ("fingerprints", "prompt")
+
+    def __init__(self, fingerprints, prompt):
+        self.fingerprints = fingerprints
+        self.prompt = prompt
+
+
+class OllamaPromptCompiler:
+    """
+    Linear-time prompt builder with a per-conversation prefix cache.
+
+    Conversations are identified by their first two messages (the agent's
+    system prompt and task). When a call extends a cached conversation, only
+    the messages after the cached prefix are rendered.
+    """
+
+    def __init__(self, max_conversations=64):
+        """
+        Args:
+            max_conversations: Number of conversations whose rendered prefix is kept
+        """
+        self.max_conversations = max_conversations
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def compile(self, messages):
+        """
+        Render messages into an Ollama prompt
+
+        Args:
+            messages: List of chat message dicts
+
+        Returns:
+            Prompt string
+        """
+        if not messages:
+            logger.warning("Empty messages list in ollama_pt, returning default prompt")
+            return DEFAULT_PROMPT
+
+        valid = [msg for msg in messages if isinstance(msg, dict)]
+        if len(valid) != len(messages):
+            logger.warning(f"Skipping {len(messages) - len(valid)} non-dict message(s)")
+        if not valid:
+            logger.warning("No valid messages found")
+            return DEFAULT_PROMPT
+
+        fingerprints = [_fingerprint(msg) for msg in valid]
+
+        # Leading system messages are merged into a single system block
+        system_count = 0
+        while system_count < len(valid) and fingerprints[system_count][0] == "system":
+            system_count += 1
+        if system_count == len(valid):
+            logger.warning("No user or assistant messages to process")
+            system = "".join(msg.get("content") or "" for msg in valid)
+            if system:
+                return f"<system>\n{system}\n</system>\n\n<user>\nHelp me\n</user>"
+            return DEFAULT_PROMPT
+
+        key = tuple(fingerprints[:2])
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+
+        start = 0
+        parts = []
+        if (cached is not None
+                and system_count < len(cached.fingerprints) <= len(fingerprints)
+                and fingerprints[:len(cached.fingerprints)] == cached.fingerprints):
+            # Reuse the rendered prefix and only render the new tail
+            self.hits += 1
+            start = len(cached.fingerprints)
+            parts.append(cached.prompt)
+        else:
+            self.misses += 1
+            system = "".join(msg.get("content") or "" for msg in valid[:system_count])
+            if system:
+                parts.append(f"<system>\n{system}\n</system>\n\n")
+            start = system_count
+
+        for msg in valid[max(start, system_count):]:
+            render_message(msg, parts)
+        prompt = "".join(parts)
+
+        with self._lock:
+            self._cache[key] = _CompiledConversation(fingerprints, prompt)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_conversations:
+                self._cache.popitem(last=False)
+
+        logger.debug(
+            f"Compiled Ollama prompt: {len(valid)} messages, {len(valid) - start} rendered, "
+            f"length {len(prompt)}"
+        )
+        return prompt
@@ -0,0 +1,178 @@
+"""
+Checkpoint store for CrewSurf pipeline runs
+
+A full pipeline run can take hours of local-model time, and a crash of Ollama
+or the bridge used to lose all of it. Each task's output is written to a run
+directory as soon as the task completes, together with a fingerprint of what
+it was based on: the task's description and expected output, a hash of its
+agent's configuration, and the outputs it was given as context. A resumed run
+reuses every completed task whose fingerprint still matches and executes the
+rest.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(value) -> str:
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+def _llm_config(llm) -> Dict[str, Any]:
+    if llm is None:
+        return {}
+    if isinstance(llm, str):
+        return {"model": llm}
+    config = {"type": type(llm).__name__}
+    for attribute in ("model", "model_name", "temperature", "base_url", "bridge_url"):
+        value = getattr(llm, attribute, None)
+        if value is not None:
+            config[attribute] = value
+    return config
+
+
+def agent_config_hash(agent) -> str:
+    """Hash of the agent settings that affect what it produces"""
+    if agent is None:
+        return _digest({})
+    return _digest({
+        "role": getattr(agent, "role", None),
+        "goal": getattr(agent, "goal", None),
+        "backstory": getattr(agent, "backstory", None),
+        "allow_delegation": getattr(agent, "allow_delegation", None),
+        "llm": _llm_config(getattr(agent, "llm", None)),
+        "tools": sorted(getattr(tool, "name", type(tool).__name__) for tool in getattr(agent, "tools", None) or ()),
+    })
+
+
+def task_inputs(task, previous_outputs: Iterable[str], manager=None) -> Dict[str, Any]:
+    """
+    Describe what a task's output is based on
+
+    Args:
+        task: CrewAI Task
+        previous_outputs: Raw outputs of the tasks it sees as context
+        manager: Manager agent of a hierarchical crew, which also shapes every output, or None
+    """
+    inputs = {
+        "description": task.description,
+        "expected_output": task.expected_output,
+        "agent_config_hash": agent_config_hash(getattr(task, "agent", None)),
+        "previous_outputs": [_digest(output) for output in previous_outputs],
+    }
+    if manager is not None:
+        inputs["manager_config_hash"] = agent_config_hash(manager)
+    return inputs
+
+
+class RunStore:
+    """
+    Directory of task checkpoints for one pipeline run.
+
+    Runs live in timestamped subdirectories of a root directory, one JSON file
+    per completed task, each written atomically so a crash mid-write never
+    leaves a corrupt checkpoint behind.
+    """
+
+    def __init__(self, root: str = "crew_runs", run_id: Optional[str] = None):
+        """
+        Args:
+            root: Directory holding all runs
+            run_id: Run to open, or None to start a new one
+        """
+        self.root = root
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(root, self.run_id)
+        os.makedirs(self.path, exist_ok=True)
+
+    @classmethod
+    def latest(cls, root: str = "crew_runs") -> Optional["RunStore"]:
+        """Open the most recent run under root, or None if there is none"""
+        if not os.path.isdir(root):
+            return None
+        runs = sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+        return cls(root, runs[-1]) if runs else None
+
+    def _task_path(self, index: int) -> str:
+        return os.path.join(self.path, f"task_{index:02d}.json")
+
+    def save(self, index: int, task, inputs: Dict[str, Any], output: str, agent: str = "") -> Dict[str, Any]:
+        """
+        Record a completed task
+
+        Args:
+            index: Position of the task in the pipeline
+            task: CrewAI Task that produced the output
+            inputs: task_inputs() the task ran with
+            output: Raw task output
+            agent: Role of the agent that produced it
+        """
+        record = {
+            "index": index,
+            "description": task.description,
+            "fingerprint": _digest(inputs),
+            "inputs": inputs,
+            "output": output,
+            "agent": agent,
+            "completed_at": time.time(),
+        }
+        path = self._task_path(index)
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2)
+        os.replace(temporary, path)
+        logger.info(f"Checkpointed task {index} to {path}")
+        return record
+
+    def load(self, index: int) -> Optional[Dict[str, Any]]:
+        """The checkpoint of the task at index, or None"""
+        try:
+            with open(self._task_path(index), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint for task {index}: {e}")
+            return None
+
+    def reusable(self, tasks: List[Any], manager=None,
+                 dependencies: Optional[Callable[[int], Iterable[int]]] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        Checkpoints that can stand in for tasks of a pipeline
+
+        A task is reusable when its checkpoint's fingerprint still matches and
+        every task it depends on is reusable too; once a task has to run again,
+        so do all the tasks that use its output.
+
+        Args:
+            tasks: Pipeline tasks, each listed after its dependencies
+            manager: Manager agent of the crew
+            dependencies: Maps a task's index to the indices of the tasks whose
+                          outputs it sees; by default every task sees all tasks before it
+
+        Returns:
+            Checkpoint records by task index
+        """
+        dependencies = dependencies or range
+        records: Dict[int, Dict[str, Any]] = {}
+        for index, task in enumerate(tasks):
+            needed = list(dependencies(index))
+            if any(i not in records for i in needed):
+                continue
+            record = self.load(index)
+            if record is None:
+                continue
+            inputs = task_inputs(task, [records[i]["output"] for i in needed], manager)
+            if record.get("fingerprint") != _digest(inputs):
+                logger.info(f"Task {index} changed since it was checkpointed, re-running it")
+                continue
+            records[index] = record
+        return records
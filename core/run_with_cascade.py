@@ -1,14 +1,15 @@
 import os
 import sys
 import glob
+import argparse
 import time
 import logging
 from datetime import datetime
 from pathlib import Path
 
-# Apply patches early to fix LiteLLM Ollama integration issues
-from core.patches.litellm_patch import patch_litellm
-logging.info("Applying LiteLLM patches for Ollama integration")
+# Patch LiteLLM's Ollama integration as soon as litellm is imported
+from core.patches.litellm_patch import install_import_hook
+install_import_hook()
 
 # Configure logging
 logging.basicConfig(
@@ -24,7 +25,7 @@ except ImportError:
     from langchain_community.embeddings import OllamaEmbeddings
 
 # Use our centralized LLM configuration
-from core.config.llm_config import get_ollama_llm, get_all_agent_configs, configure_environment_for_local, print_model_config
+from core.config.llm_config import get_ollama_llm, get_all_agent_configs, configure_environment_for_local, print_model_config, CLIENT_METRICS_PORT
 from langchain_core.vectorstores import VectorStore
 from langchain_community.vectorstores import FAISS
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -34,7 +35,9 @@ from langchain_community.tools import DuckDuckGoSearchRun
 
 # Import local modules
 from core.crew import run_crewsurfai_pipeline
+from core.warmup import start_model_warmup, wait_for_model_warmup
 from bridge.cascade_bridge import CascadeLLM
+from bridge.metrics import serve_client_metrics
 
 def scan_codebase(source_dir):
     """Scan the codebase for relevant files and build embeddings
@@ -135,8 +138,14 @@ def create_memory_tool(memory_store, ollama_llm):
     
     return codebase_memory
 
-def run_modified_crew(memory_store):
-    """Run the CrewSurfAI pipeline with memory tools"""
+def run_modified_crew(memory_store, resume=False, run_id=None):
+    """Run the CrewSurfAI pipeline with memory tools
+    
+    Args:
+        memory_store: Vector store of the scanned codebase
+        resume: Continue a previous run from its checkpoints
+        run_id: Run to resume, the most recent one by default
+    """
     # Create web search tool
     web_search_tool = DuckDuckGoSearchRun()
     
@@ -164,18 +173,32 @@ def run_modified_crew(memory_store):
     agents_config = get_all_agent_configs()
     print_model_config()
     
-    run_crewsurfai_pipeline(tools_dict)
+    # Expose the agents' bridge latency alongside the bridge's own /metrics
+    if CLIENT_METRICS_PORT:
+        serve_client_metrics(CLIENT_METRICS_PORT)
+        print(f"Client metrics on http://127.0.0.1:{CLIENT_METRICS_PORT}/metrics")
+    
+    run_crewsurfai_pipeline(tools_dict, resume=resume, run_id=run_id)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the CrewSurfAI pipeline with Cascade integration")
+    parser.add_argument('--resume', nargs='?', const='', default=None, metavar='RUN_ID',
+                        help="Resume a crashed run, skipping completed tasks (the most recent run by default)")
+    args = parser.parse_args()
+    
     # Show provider list
     print("\nProvider List: https://docs.litellm.ai/docs/providers\n")
     
+    # Load models in the background while the codebase is indexed
+    warmup = start_model_warmup()
+    
     # Scan codebase and set up vector store directly
     memory_store = scan_codebase("./")
+    wait_for_model_warmup(warmup)
     
     if memory_store is None:
         print("Failed to create memory store. Exiting.")
         sys.exit(1)
     
     # Run the modified crew with memory tools
-    run_modified_crew(memory_store)
+    run_modified_crew(memory_store, resume=args.resume is not None, run_id=args.resume or None)
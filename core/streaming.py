@@ -0,0 +1,132 @@
+"""
+Token streaming support for CrewSurf agents
+
+This module provides a LangChain callback handler that prints tokens to the
+console as soon as Ollama produces them, optionally relays them to the Cascade
+bridge, and logs time-to-first-token (prefill) separately from decode time.
+"""
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import requests
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingConsoleHandler(BaseCallbackHandler):
+    """
+    Callback handler that streams generated tokens for one agent role.
+
+    Tokens are written to stdout as they arrive. If a bridge URL is given,
+    tokens are buffered and forwarded to the bridge's /stream endpoint in
+    small batches so the operator can follow generations from the bridge console.
+    """
+
+    def __init__(self, role: str, bridge_url: Optional[str] = None,
+                 print_tokens: bool = True, relay_chars: int = 64):
+        """
+        Args:
+            role: Agent role name used in log lines and bridge relay messages
+            bridge_url: Base URL of the Cascade bridge, or None to disable relaying
+            print_tokens: If True, print tokens to the console as they arrive
+            relay_chars: Number of buffered characters that triggers a relay to the bridge
+        """
+        self.role = role
+        self.bridge_url = bridge_url
+        self.print_tokens = print_tokens
+        self.relay_chars = relay_chars
+        self._runs: Dict[Any, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._session = requests.Session() if bridge_url else None
+        self._relay_failed = False
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *,
+                     run_id: Any = None, **kwargs: Any) -> None:
+        """Record the start of a generation"""
+        with self._lock:
+            self._runs[run_id] = {
+                "start": time.perf_counter(),
+                "first_token": None,
+                "tokens": 0,
+                "buffer": [],
+                "buffered_chars": 0,
+            }
+        if self.print_tokens:
+            print(f"\n[{self.role}] ", end="", flush=True)
+
+    def on_llm_new_token(self, token: str, *, run_id: Any = None, **kwargs: Any) -> None:
+        """Print a token and log time-to-first-token on the first one"""
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None:
+                # Token without a matching start event, track it from here
+                run = self._runs[run_id] = {
+                    "start": time.perf_counter(),
+                    "first_token": None,
+                    "tokens": 0,
+                    "buffer": [],
+                    "buffered_chars": 0,
+                }
+            if run["first_token"] is None:
+                run["first_token"] = time.perf_counter()
+                logger.info(f"[{self.role}] time to first token: {run['first_token'] - run['start']:.2f}s")
+            run["tokens"] += 1
+            relay = None
+            if self._session is not None:
+                run["buffer"].append(token)
+                run["buffered_chars"] += len(token)
+                if run["buffered_chars"] >= self.relay_chars or "\n" in token:
+                    relay = "".join(run["buffer"])
+                    run["buffer"] = []
+                    run["buffered_chars"] = 0
+
+        if self.print_tokens:
+            print(token, end="", flush=True)
+        if relay:
+            self._relay(run_id, relay, done=False)
+
+    def on_llm_end(self, response: Any, *, run_id: Any = None, **kwargs: Any) -> None:
+        """Flush remaining tokens and log prefill versus decode timing"""
+        self._finish(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: Any = None, **kwargs: Any) -> None:
+        """Flush remaining tokens when a generation fails"""
+        self._finish(run_id)
+
+    def _finish(self, run_id: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        if self.print_tokens:
+            print(flush=True)
+        if self._session is not None:
+            self._relay(run_id, "".join(run["buffer"]), done=True)
+
+        end = time.perf_counter()
+        if run["first_token"] is not None:
+            prefill = run["first_token"] - run["start"]
+            decode = end - run["first_token"]
+            rate = run["tokens"] / decode if decode > 0 else 0.0
+            logger.info(
+                f"[{self.role}] prefill {prefill:.2f}s, decode {decode:.2f}s "
+                f"for {run['tokens']} tokens ({rate:.1f} tokens/s)"
+            )
+
+    def _relay(self, run_id: Any, text: str, done: bool) -> None:
+        """Forward a batch of tokens to the bridge's /stream endpoint"""
+        if self._relay_failed:
+            return
+        try:
+            self._session.post(
+                f"{self.bridge_url}/stream",
+                json={"role": self.role, "run_id": str(run_id), "tokens": text, "done": done},
+                timeout=2,
+            )
+        except requests.exceptions.RequestException as e:
+            # Don't slow down every token once the bridge is known to be unreachable
+            logger.warning(f"Disabling token relay to bridge for {self.role}: {e}")
+            self._relay_failed = True
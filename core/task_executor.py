@@ -0,0 +1,120 @@
+"""
+Parallel task execution for CrewSurf
+
+A hierarchical crew runs its tasks one at a time, even when they don't use
+each other's outputs. TaskGraphExecutor runs the tasks of a TaskGraph as soon
+as their dependencies have finished, several at once, with the number of tasks
+in flight capped so the local models aren't oversubscribed. Each task runs
+directly on its agent with its dependencies' outputs as context, the same
+context a crew would give it.
+
+Tasks run this way skip the crew's manager, so nothing is delegated; use it
+only when every task can be done by the agent it is assigned to.
+"""
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterable, List, Optional
+
+from core.config.llm_config import MODEL_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+# How CrewAI separates the outputs of context tasks
+CONTEXT_SEPARATOR = "\n\n----------\n\n"
+
+
+class TaskGraphExecutor:
+    """
+    Runs TaskGraph tasks concurrently in dependency order.
+
+    A task starts once every dependency it has in the graph has an output,
+    either from this run or stored from an earlier one. Tasks of the same agent
+    never run at the same time, since CrewAI agents keep per-task state.
+    """
+
+    def __init__(self, graph, max_concurrency: int = MODEL_CONCURRENCY, agents: Optional[Iterable] = None):
+        """
+        Args:
+            graph: TaskGraph declaring which tasks use which others' outputs
+            max_concurrency: Maximum number of tasks (and so model calls) in flight
+            agents: Agents to run tasks with, matched to each task's agent by role;
+                    tasks run on their own agent when none matches
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.graph = graph
+        self.max_concurrency = max_concurrency
+        self.agents = {agent.role: agent for agent in agents or ()}
+
+    def agent_for(self, task):
+        return self.agents.get(getattr(task.agent, "role", None), task.agent)
+
+    def context_for(self, task) -> str:
+        """The outputs of a task's dependencies, joined the way CrewAI joins context"""
+        outputs = [dependency.output.raw for dependency in self.graph.dependencies(task)
+                   if dependency.output is not None]
+        return CONTEXT_SEPARATOR.join(outputs)
+
+    def _execute(self, task):
+        agent = self.agent_for(task)
+        start = time.time()
+        logger.info(f"Starting task '{self.graph.name(task)}' on {agent.role}")
+        output = task.execute_sync(agent=agent, context=self.context_for(task),
+                                   tools=task.tools or agent.tools)
+        logger.info(f"Finished task '{self.graph.name(task)}' in {time.time() - start:.1f}s")
+        return output
+
+    def run(self, tasks: Optional[Iterable] = None) -> List[Any]:
+        """
+        Execute tasks, running independent ones concurrently
+
+        Dependencies outside tasks are not executed; their stored outputs are used.
+
+        Args:
+            tasks: Tasks to run, all tasks in the graph by default
+
+        Returns:
+            The task outputs, in topological order
+
+        Raises:
+            ValueError: A dependency outside tasks has no stored output
+        """
+        # Each task gets its dependencies' outputs passed in directly, so the
+        # shared Task objects' context is left alone
+        ordered = self.graph.topological_order(tasks)
+        missing = {self.graph.name(dependency) for task in ordered for dependency in self.graph.dependencies(task)
+                   if dependency not in ordered and dependency.output is None}
+        if missing:
+            raise ValueError(f"Tasks depend on outputs that don't exist yet: {', '.join(sorted(missing))}")
+        waiting = list(ordered)
+        done = set()
+        running: Dict[Any, Any] = {}  # future -> task
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="crew-task") as pool:
+            while waiting or running:
+                busy_agents = {id(self.agent_for(task)) for task in running.values()}
+                for task in list(waiting):
+                    if len(running) >= self.max_concurrency:
+                        break
+                    ready = all(dependency in done or dependency not in ordered
+                                for dependency in self.graph.dependencies(task))
+                    if ready and id(self.agent_for(task)) not in busy_agents:
+                        waiting.remove(task)
+                        busy_agents.add(id(self.agent_for(task)))
+                        running[pool.submit(self._execute, task)] = task
+
+                if not running:
+                    raise RuntimeError("No task can start - the remaining tasks wait on each other")
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        logger.error(f"Task '{self.graph.name(task)}' failed: {error}")
+                        for pending in running:
+                            pending.cancel()
+                        raise error
+                    done.add(task)
+
+        return [task.output for task in ordered]
@@ -0,0 +1,140 @@
+"""
+Task dependency graph for CrewSurf
+
+Records which tasks consume which other tasks' outputs, so work can be re-run
+incrementally: when a task is added or changes, only it and the tasks that
+depend on it need to execute again, and everything else is reused from the
+outputs CrewAI stored on the tasks when they last ran.
+"""
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class TaskGraph:
+    """
+    Directed acyclic graph of CrewAI tasks.
+
+    Tasks are kept in insertion order, which is also the tie-breaker for
+    topological ordering, so independent tasks run in the order they were added.
+    """
+
+    def __init__(self):
+        self._dependencies: Dict[Any, List[Any]] = {}
+
+    def add(self, task, depends_on: Iterable = ()) -> None:
+        """
+        Add a task, or extend the dependencies of one already in the graph
+
+        Args:
+            task: CrewAI Task
+            depends_on: Tasks whose outputs this task uses
+        """
+        dependencies = self._dependencies.setdefault(task, [])
+        for dependency in depends_on:
+            if dependency not in self._dependencies:
+                raise ValueError(f"Dependency '{self.name(dependency)}' is not in the graph")
+            if dependency is task or task in self.ancestors([dependency]):
+                raise ValueError(f"Adding '{self.name(dependency)}' as a dependency of "
+                                 f"'{self.name(task)}' would create a cycle")
+            if dependency not in dependencies:
+                dependencies.append(dependency)
+
+    def copy(self) -> "TaskGraph":
+        """A graph with the same tasks and edges that can be extended without changing this one"""
+        graph = TaskGraph()
+        graph._dependencies = {task: list(dependencies) for task, dependencies in self._dependencies.items()}
+        return graph
+
+    @staticmethod
+    def name(task) -> str:
+        description = getattr(task, "description", str(task))
+        return description[:40]
+
+    @property
+    def tasks(self) -> List[Any]:
+        return list(self._dependencies)
+
+    def __contains__(self, task) -> bool:
+        return task in self._dependencies
+
+    def dependencies(self, task) -> List[Any]:
+        return list(self._dependencies.get(task, ()))
+
+    def dependents(self, task) -> List[Any]:
+        return [t for t, dependencies in self._dependencies.items() if task in dependencies]
+
+    def ancestors(self, tasks: Iterable) -> Set[Any]:
+        """Every task the given tasks depend on, directly or indirectly"""
+        found: Set[Any] = set()
+        stack = [d for task in tasks for d in self._dependencies.get(task, ())]
+        while stack:
+            task = stack.pop()
+            if task not in found:
+                found.add(task)
+                stack.extend(self._dependencies.get(task, ()))
+        return found
+
+    def descendants(self, tasks: Iterable) -> Set[Any]:
+        """Every task that depends on the given tasks, directly or indirectly"""
+        found: Set[Any] = set()
+        stack = list(tasks)
+        while stack:
+            for dependent in self.dependents(stack.pop()):
+                if dependent not in found:
+                    found.add(dependent)
+                    stack.append(dependent)
+        return found
+
+    def sinks(self) -> List[Any]:
+        """Tasks no other task depends on - the latest results of the graph"""
+        used = {d for dependencies in self._dependencies.values() for d in dependencies}
+        return [task for task in self._dependencies if task not in used]
+
+    def topological_order(self, tasks: Optional[Iterable] = None) -> List[Any]:
+        """
+        Order tasks so each comes after its dependencies
+
+        Args:
+            tasks: Subset of tasks to order, or None for the whole graph
+        """
+        selected = set(self._dependencies if tasks is None else tasks)
+        ordered: List[Any] = []
+        done: Set[Any] = set()
+        remaining = [task for task in self._dependencies if task in selected]
+        while remaining:
+            ready = [task for task in remaining
+                     if all(d in done or d not in selected for d in self._dependencies[task])]
+            for task in ready:
+                ordered.append(task)
+                done.add(task)
+            remaining = [task for task in remaining if task not in done]
+        return ordered
+
+    def affected_by(self, tasks: Iterable) -> List[Any]:
+        """The given tasks plus everything downstream of them, in execution order"""
+        tasks = list(tasks)
+        return self.topological_order(set(tasks) | self.descendants(tasks))
+
+    @contextmanager
+    def wire_context(self, tasks: Iterable) -> Iterator[None]:
+        """
+        Point each task's CrewAI context at its dependencies while the block runs
+
+        Dependencies that already ran keep their stored output, so CrewAI feeds
+        that output to the task instead of executing the dependency again. The
+        tasks are shared module-level objects, so their previous contexts are
+        restored afterwards.
+        """
+        previous = {task: task.context for task in tasks}
+        try:
+            for task in previous:
+                dependencies = self.dependencies(task)
+                if dependencies:
+                    task.context = dependencies
+            yield
+        finally:
+            for task, context in previous.items():
+                task.context = context
@@ -0,0 +1,104 @@
+"""
+Model warm-up for CrewSurf
+
+Loads every Ollama model referenced by the LLM configuration on every server in
+OLLAMA_BASE_URLS before the first agent call, so the model-load cost overlaps
+with codebase indexing instead of stalling the first request routed to a server. Each warm-up request also sets an explicit keep_alive
+so models stay resident between human responses.
+"""
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from core.config.llm_config import OLLAMA_BASE_URL, OLLAMA_BASE_URLS, OLLAMA_KEEP_ALIVE, get_referenced_models
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up_model(model, embedding=False, base_url=OLLAMA_BASE_URL, keep_alive=OLLAMA_KEEP_ALIVE):
+    """
+    Load a single model into Ollama's memory
+
+    Args:
+        model: Model name without provider prefix (e.g. 'qwen3')
+        embedding: If True, warm the model through the embedding endpoint
+        base_url: Ollama server to load the model on
+        keep_alive: How long Ollama should keep the model loaded
+
+    Returns:
+        Seconds spent loading the model
+    """
+    start = time.perf_counter()
+    if embedding:
+        response = requests.post(
+            f"{base_url}/api/embed",
+            json={"model": model, "input": "warm-up", "keep_alive": keep_alive},
+            timeout=600
+        )
+    else:
+        # An empty prompt makes Ollama load the model without generating anything
+        response = requests.post(
+            f"{base_url}/api/generate",
+            json={"model": model, "prompt": "", "keep_alive": keep_alive, "stream": False},
+            timeout=600
+        )
+    response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    logger.info(f"Warmed up {model} on {base_url} in {elapsed:.1f}s (keep_alive={keep_alive})")
+    return elapsed
+
+
+def start_model_warmup(models=None, keep_alive=OLLAMA_KEEP_ALIVE, base_urls=None):
+    """
+    Start loading models in the background
+
+    Args:
+        models: Dictionary of model name to embedding flag, defaults to
+                every model referenced by llm_config
+        keep_alive: How long Ollama should keep the models loaded
+        base_urls: Ollama servers to load the models on, defaults to OLLAMA_BASE_URLS,
+                   since the endpoint pool may route any request to any of them
+
+    Returns:
+        Dictionary of model name (with the server when there are several) to
+        Future, to be passed to wait_for_model_warmup
+    """
+    if models is None:
+        models = get_referenced_models()
+    if base_urls is None:
+        base_urls = OLLAMA_BASE_URLS
+
+    executor = ThreadPoolExecutor(max_workers=max(1, len(models) * len(base_urls)), thread_name_prefix="warmup")
+    futures = {
+        (model if len(base_urls) == 1 else f"{model} on {url}"):
+            executor.submit(warm_up_model, model, embedding, base_url=url, keep_alive=keep_alive)
+        for model, embedding in models.items()
+        for url in base_urls
+    }
+    # Don't block here - the worker threads finish on their own
+    executor.shutdown(wait=False)
+    print(f"Warming up {len(futures)} model(s) in the background: {', '.join(futures)}")
+    return futures
+
+
+def wait_for_model_warmup(futures):
+    """
+    Wait for background warm-up to finish and report the result
+
+    Args:
+        futures: Dictionary returned by start_model_warmup
+
+    Returns:
+        True if every model loaded successfully
+    """
+    all_loaded = True
+    for model, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            # A failed warm-up only means the first call pays the load cost
+            logger.warning(f"Could not warm up {model}: {e}")
+            all_loaded = False
+    return all_loaded
@@ -6,19 +6,22 @@ It enables customer interactions with the AI crew through a custom tool interfac
 """
 
 import logging
-import requests
-import json
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any
 from langchain.tools import BaseTool
-from pydantic import BaseModel, Field
-from datetime import datetime
+from pydantic import Field
+
+from bridge.cascade_bridge import BridgeError, CascadeLLM
+from core.config.llm_config import CONVERSATION_HISTORY_MAX_ENTRIES, CONVERSATION_LOG_DIR
+from core.conversation_history import ConversationHistory
 
 class WindsurfCustomerTool(BaseTool):
     """
     Tool for integrating customer interaction with WindsurfAI.
     
     This tool allows agents to interact with the customer by sending messages
-    and receiving responses through a custom integration bridge.
+    and receiving responses through a custom integration bridge. Messages are
+    submitted as bridge jobs and the reply is long-polled, so the customer can
+    take as long as they need without the request timing out.
     """
     
     name: str = "WindsurfCustomerTool"
@@ -26,63 +29,103 @@ class WindsurfCustomerTool(BaseTool):
         "Use this tool to ask the customer questions or provide information. "
         "Pass your message to the customer, and they will reply."
     )
+    bridge_url: str = "http://localhost:8089"
+    agent_role: str = "Customer Tool"  # Role of the agent using this tool, shown to the customer
+    job_timeout: Optional[float] = None  # Give up on the customer after this long (None waits indefinitely)
+    conversation_history: Any = Field(default=None, exclude=True)
+    logger: Any = Field(default=None, exclude=True)
     
-    def __init__(self, bridge_url: str = "http://localhost:8089/message", **kwargs):
-        """Initialize the WindsurfCustomerTool with a bridge URL."""
-        super().__init__(**kwargs)
-        self.bridge_url = bridge_url
-        self.conversation_history = []
+    def __init__(self, bridge_url: str = "http://localhost:8089", agent_role: str = "Customer Tool", **kwargs):
+        """
+        Initialize the WindsurfCustomerTool.
+        
+        Args:
+            bridge_url: Base URL of the bridge (a trailing /message is ignored)
+            agent_role: Role of the agent this tool belongs to - give each agent its own tool
+        """
+        bridge_url = bridge_url.rstrip("/")
+        if bridge_url.endswith("/message"):
+            bridge_url = bridge_url[:-len("/message")]
+        super().__init__(bridge_url=bridge_url, agent_role=agent_role, **kwargs)
+        self.conversation_history = ConversationHistory(
+            max_entries=CONVERSATION_HISTORY_MAX_ENTRIES,
+            log_dir=CONVERSATION_LOG_DIR,
+            name="windsurf-customer"
+        )
         self.logger = logging.getLogger(__name__)
+    
+    @classmethod
+    def for_agent(cls, agent, **kwargs) -> "WindsurfCustomerTool":
+        """Create a tool that shows the customer which agent is asking."""
+        return cls(agent_role=agent.role, **kwargs)
+    
+    def _bridge(self) -> CascadeLLM:
+        # Bridge sessions, health checks and circuit breakers are shared per URL,
+        # so a client per call is cheap
+        return CascadeLLM(
+            bridge_url=self.bridge_url,
+            agent_role=self.agent_role,
+            kind="message",
+            job_timeout=self.job_timeout
+        )
         
     def _run(self, message: str) -> str:
         """Run the tool to interact with the customer."""
         self.logger.info(f"Sending message to customer: {message}")
         
         # Add message to conversation history
-        self.conversation_history.append({
-            "role": "agent",
-            "content": message,
-            "timestamp": datetime.now().isoformat()
-        })
+        self._add_to_history("agent", message)
         
-        # Send message to bridge service
+        # Submit the message as a job and long-poll for the customer's reply
         try:
-            response = requests.post(
-                self.bridge_url,
-                json={"message": message},
-                headers={"Content-Type": "application/json"},
-                timeout=120  # Extended timeout for longer conversations
-            )
+            customer_response = self._bridge().invoke(message)
+            self.logger.info(f"Received customer response: {customer_response}")
             
-            if response.status_code == 200:
-                customer_response = response.json().get("response", "No response received")
-                self.logger.info(f"Received customer response: {customer_response}")
-                
-                # Add customer response to conversation history
-                self.conversation_history.append({
-                    "role": "customer",
-                    "content": customer_response,
-                    "timestamp": datetime.now().isoformat()
-                })
-                
-                return customer_response
-            else:
-                error_msg = f"Error communicating with bridge: {response.status_code} - {response.text}"
-                self.logger.error(error_msg)
-                return error_msg
+            # Add customer response to conversation history
+            self._add_to_history("customer", customer_response)
+            
+            return customer_response
                 
-        except requests.exceptions.RequestException as e:
-            error_msg = f"Failed to connect to bridge: {str(e)}"
+        except (BridgeError, TimeoutError) as e:
+            error_msg = f"Failed to get a response from the customer: {str(e)}"
             self.logger.error(error_msg)
             return error_msg
     
-    def _arun(self, message: str) -> str:
-        """Async version of _run (not implemented)."""
-        raise NotImplementedError("Async version not implemented yet")
+    async def _arun(self, message: str) -> str:
+        """Async version of _run, waiting for the customer without holding a thread."""
+        self.logger.info(f"Sending message to customer: {message}")
+        self._add_to_history("agent", message)
+        
+        try:
+            customer_response = await self._bridge().ainvoke(message)
+            self.logger.info(f"Received customer response: {customer_response}")
+            self._add_to_history("customer", customer_response)
+            return customer_response
+                    
+        except (BridgeError, TimeoutError) as e:
+            error_msg = f"Failed to get a response from the customer: {str(e) or type(e).__name__}"
+            self.logger.error(error_msg)
+            return error_msg
+    
+    def _add_to_history(self, role: str, content: str) -> None:
+        """Append a message to the conversation history."""
+        self.conversation_history.append(role, content)
+    
+    def get_conversation_history(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Return the conversation history between agent and customer, oldest first.
+        
+        Args:
+            offset: Index of the first entry to return
+            limit: Maximum number of entries, or None for all of them
+        """
+        if limit is None:
+            limit = len(self.conversation_history)
+        return self.conversation_history.page(offset, limit)
     
-    def get_conversation_history(self) -> List[Dict[str, Any]]:
-        """Return the conversation history between agent and customer."""
-        return self.conversation_history
+    def iter_conversation_history(self) -> Iterator[Dict[str, Any]]:
+        """Stream the conversation history one entry at a time, oldest first."""
+        return iter(self.conversation_history)
 
 
 # Example usage
@@ -16,6 +16,10 @@ logging.basicConfig(
 if __name__ == "__main__":
     print("Starting CrewSurf AI with Cascade integration...")
     from core.run_with_cascade import scan_codebase_for_memory, setup_memory_storage, run_modified_crew
+    from core.warmup import start_model_warmup, wait_for_model_warmup
+    
+    # Load models in the background while the codebase is indexed
+    warmup = start_model_warmup()
     
     # Scan codebase for Python files
     code_files = scan_codebase_for_memory()
@@ -23,6 +27,7 @@ if __name__ == "__main__":
     
     # Set up memory storage
     memory_store, _ = setup_memory_storage(code_files)
+    wait_for_model_warmup(warmup)
     
     # Run the modified crew with memory tools
     run_modified_crew(memory_store)
@@ -30,7 +30,7 @@ setup(
         "langchain>=0.0.267",
         "langchain_community>=0.0.5",
         "chromadb>=0.4.13",
-        "flask>=2.0.0",
+        "aiohttp>=3.9.0",
         "requests>=2.28.0",
     ],
 )
@@ -0,0 +1,26 @@
+"""
+Tests for the bridge's answer memory
+"""
+from bridge.answer_memory import AnswerMemory
+
+
+def test_only_direct_questions_are_remembered(tmp_path):
+    path = tmp_path / "answers.jsonl"
+    memory = AnswerMemory(str(path))
+    memory.record("Architect", "Thought: I should ask the human.\nAction: ask\nWhich platforms?",
+                  "Desktop", kind="generate")
+    memory.record("Architect", "Which platforms do you need?", "Desktop only", kind="message")
+
+    assert [entry["answer"] for entry in memory.entries] == ["Desktop only"]
+    assert [entry["answer"] for entry in AnswerMemory(str(path)).entries] == ["Desktop only"]
+
+
+def test_search_finds_similar_questions():
+    memory = AnswerMemory(None)
+    memory.record("Architect", "Which libGDX version should we target?", "1.12.1")
+    memory.record("Architect", "Which platforms do you need?", "Desktop only")
+    memory.record("QA Lead", "Should the tests run on CI?", "Yes, GitHub Actions")
+
+    (score, entry), = memory.search("What libGDX version do we target?")
+    assert entry["answer"] == "1.12.1" and score >= memory.suggest_threshold
+    assert memory.search("Unrelated words entirely") == []
@@ -0,0 +1,273 @@
+"""
+Tests for the bridge server, run against a real aiohttp server on localhost
+
+Prompts are routed to a remote operator that nobody is answering, so they
+stay queued until the test takes them through the operator API.
+"""
+import asyncio
+
+import aiohttp
+from aiohttp import web
+
+from bridge.cascade_bridge import CascadeLLM, bridge_capabilities, record_bridge_health
+from bridge.metrics import serve_client_metrics
+from bridge.run_bridge import SERVER_OPTIONS, create_app
+
+
+async def start_bridge(routes=("*=alice",), **options):
+    app = create_app(routes=list(routes), **options)
+    runner = web.AppRunner(app, **SERVER_OPTIONS)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return app, runner, f"http://127.0.0.1:{port}"
+
+
+async def next_prompt(client, url, operator):
+    async with client.get(f"{url}/operators/{operator}/next", params={"wait": "5"}) as response:
+        return await response.json()
+
+
+async def answer(client, url, operator, prompt, text, lease=None):
+    payload = {"job_id": prompt["job_id"], "lease": lease or prompt["lease"], "response": text}
+    async with client.post(f"{url}/operators/{operator}/answer", json=payload) as response:
+        return response.status
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_prompt_of_disconnected_client_is_not_shown_to_operator():
+    async def scenario():
+        app, runner, url = await start_bridge()
+        try:
+            async with aiohttp.ClientSession() as client:
+                try:
+                    await client.post(f"{url}/generate", json={"role": "Architect", "prompt": "Which DB?"},
+                                      timeout=aiohttp.ClientTimeout(total=0.5))
+                except asyncio.TimeoutError:
+                    pass
+                await asyncio.sleep(0.2)
+
+                alice = app['router'].get("alice")
+                assert alice.pending() == []
+                async with client.get(f"{url}/operators/alice/next") as response:
+                    assert response.status == 204
+        finally:
+            await runner.cleanup()
+
+    run(scenario())
+
+
+def test_prompt_of_connected_client_is_answered():
+    async def scenario():
+        app, runner, url = await start_bridge()
+        try:
+            async with aiohttp.ClientSession() as client:
+                request = asyncio.create_task(
+                    client.post(f"{url}/generate", json={"role": "Architect", "prompt": "Which DB?"}))
+                prompt = await next_prompt(client, url, "alice")
+                assert prompt["prompt"] == "Which DB?"
+                assert await answer(client, url, "alice", prompt, "Postgres") == 200
+                async with await request as response:
+                    assert (await response.json())["response"] == "Postgres"
+        finally:
+            await runner.cleanup()
+
+    run(scenario())
+
+
+async def metric_lines(client, url, name):
+    async with client.get(f"{url}/metrics") as response:
+        text = await response.text()
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+def test_unanswered_polls_are_not_counted_as_abandoned():
+    async def scenario():
+        app, runner, url = await start_bridge()
+        try:
+            async with aiohttp.ClientSession() as client:
+                async with client.post(f"{url}/jobs", json={"role": "Architect", "prompt": "Which DB?"}) as response:
+                    job = await response.json()
+                for _ in range(2):
+                    async with client.get(f"{url}/jobs/{job['job_id']}", params={"wait": "0.2"}) as response:
+                        assert (await response.json())["status"] == "pending"
+                assert await metric_lines(client, url, "bridge_abandoned_requests_total{") == []
+        finally:
+            await runner.cleanup()
+
+    run(scenario())
+
+
+def test_disconnects_cancellations_and_expired_jobs_are_counted():
+    async def scenario():
+        app, runner, url = await start_bridge()
+        try:
+            async with aiohttp.ClientSession() as client:
+                try:
+                    await client.post(f"{url}/generate", json={"role": "Architect", "prompt": "Gone?"},
+                                      timeout=aiohttp.ClientTimeout(total=0.3))
+                except asyncio.TimeoutError:
+                    pass
+                await asyncio.sleep(0.2)
+
+                async with client.post(f"{url}/jobs", json={"role": "Architect", "prompt": "Cancel me"}) as response:
+                    cancelled = await response.json()
+                async with client.delete(f"{url}/jobs/{cancelled['job_id']}") as response:
+                    assert (await response.json())["status"] == "cancelled"
+
+                async with client.post(f"{url}/jobs", json={"role": "Architect", "prompt": "Forget me"}) as response:
+                    forgotten = await response.json()
+                app['jobs'].abandon_ttl = 0.1
+                await asyncio.sleep(0.2)
+                app['jobs'].expire()
+                assert app['jobs'].get(forgotten['job_id']).future.cancelled()
+                assert app['router'].get("alice").pending() == []
+
+                lines = await metric_lines(client, url, "bridge_abandoned_requests_total{")
+                assert sorted(lines) == [
+                    'bridge_abandoned_requests_total{endpoint="/generate",reason="disconnect"} 1.0',
+                    'bridge_abandoned_requests_total{endpoint="/jobs",reason="cancelled"} 1.0',
+                    'bridge_abandoned_requests_total{endpoint="/jobs",reason="expired"} 1.0',
+                ]
+        finally:
+            await runner.cleanup()
+
+    run(scenario())
+
+
+def test_only_the_leasing_operator_can_answer():
+    async def scenario():
+        app, runner, url = await start_bridge(routes=["*Architect*=alice", "*Tester*=bob"])
+        try:
+            async with aiohttp.ClientSession() as client:
+                request = asyncio.create_task(
+                    client.post(f"{url}/generate", json={"role": "Chief Architect", "prompt": "Which DB?"}))
+                prompt = await next_prompt(client, url, "alice")
+
+                assert await answer(client, url, "bob", prompt, "MySQL") == 403
+                assert await answer(client, url, "carol", prompt, "MySQL") == 404
+                assert await answer(client, url, "alice", prompt, "MySQL", lease="stale") == 409
+                assert await answer(client, url, "alice", prompt, "Postgres") == 200
+                assert await answer(client, url, "alice", prompt, "SQLite") == 409
+
+                async with await request as response:
+                    assert (await response.json())["response"] == "Postgres"
+        finally:
+            await runner.cleanup()
+
+    run(scenario())
+
+
+def test_answer_to_an_expired_lease_is_not_applied(monkeypatch):
+    monkeypatch.setattr("bridge.run_bridge.OPERATOR_LEASE", 0.2)
+
+    async def scenario():
+        app, runner, url = await start_bridge()
+        try:
+            async with aiohttp.ClientSession() as client:
+                request = asyncio.create_task(
+                    client.post(f"{url}/generate", json={"role": "Architect", "prompt": "Which DB?"}))
+                first = await next_prompt(client, url, "alice")
+                await asyncio.sleep(0.3)
+
+                # The lease ran out, so the prompt was queued again and handed out afresh
+                second = await next_prompt(client, url, "alice")
+                assert second["job_id"] == first["job_id"] and second["lease"] != first["lease"]
+                assert await answer(client, url, "alice", first, "late answer") == 409
+                assert await answer(client, url, "alice", second, "Postgres") == 200
+
+                async with await request as response:
+                    assert (await response.json())["response"] == "Postgres"
+        finally:
+            await runner.cleanup()
+
+    run(scenario())
+
+
+def test_customer_messages_are_submitted_as_jobs_with_the_agents_role():
+    async def scenario():
+        app, runner, url = await start_bridge()
+        try:
+            async with aiohttp.ClientSession() as client:
+                async with client.post(f"{url}/jobs", json={"prompt": "Hi", "kind": "email"}) as response:
+                    assert response.status == 400
+
+                llm = CascadeLLM(bridge_url=url, agent_role="Chief Architect", kind="message", poll_wait=1)
+                reply = asyncio.create_task(llm.ainvoke("Which platforms do you need?"))
+                prompt = await next_prompt(client, url, "alice")
+                assert (prompt["role"], prompt["kind"]) == ("Chief Architect", "message")
+                assert await answer(client, url, "alice", prompt, "Desktop only") == 200
+                assert await reply == "Desktop only"
+        finally:
+            await runner.cleanup()
+
+    run(scenario())
+
+
+def test_client_latency_is_served_by_the_client():
+    async def scenario():
+        app, runner, url = await start_bridge()
+        server = serve_client_metrics(0)
+        try:
+            async with aiohttp.ClientSession() as client:
+                llm = CascadeLLM(bridge_url=url, agent_role="QA Lead", poll_wait=1)
+                reply = asyncio.create_task(llm.ainvoke("Ship it?"))
+                prompt = await next_prompt(client, url, "alice")
+                assert await answer(client, url, "alice", prompt, "Yes") == 200
+                assert await reply == "Yes"
+
+                client_url = f"http://127.0.0.1:{server.server_address[1]}"
+                lines = await metric_lines(client, client_url, "cascade_client_latency_seconds_count")
+                assert 'cascade_client_latency_seconds_count{role="QA Lead",outcome="ok"} 1' in lines
+        finally:
+            server.shutdown()
+            await runner.cleanup()
+
+    run(scenario())
+
+
+def test_capabilities_are_probed_once_the_bridge_is_up():
+    async def scenario():
+        app, runner, url = await start_bridge()
+        try:
+            # The first /health probe failed, then a request got through
+            record_bridge_health(url, False)
+            record_bridge_health(url, True)
+            assert bridge_capabilities(url) == {}
+
+            async with aiohttp.ClientSession() as client:
+                llm = CascadeLLM(bridge_url=url, agent_role="Architect", poll_wait=1)
+                reply = asyncio.create_task(llm.ainvoke("Which DB?"))
+                prompt = await next_prompt(client, url, "alice")
+                assert await answer(client, url, "alice", prompt, "Postgres") == 200
+                assert await reply == "Postgres"
+            assert bridge_capabilities(url)["prompt_deltas"]
+        finally:
+            await runner.cleanup()
+
+    run(scenario())
+
+
+def test_console_prompts_are_not_handed_to_remote_operators():
+    async def scenario():
+        app, runner, url = await start_bridge(routes=())
+        try:
+            async with aiohttp.ClientSession() as client:
+                request = asyncio.create_task(
+                    client.post(f"{url}/generate", json={"role": "Architect", "prompt": "Which DB?"}))
+                await asyncio.sleep(0.2)
+                console = app['session'].name
+                async with client.get(f"{url}/operators/{console}/next") as response:
+                    assert response.status == 403
+                payload = {"job_id": "any", "lease": "any", "response": "Postgres"}
+                async with client.post(f"{url}/operators/{console}/answer", json=payload) as response:
+                    assert response.status == 403
+                request.cancel()
+        finally:
+            await runner.cleanup()
+
+    run(scenario())
@@ -0,0 +1,63 @@
+"""
+Tests for conversation history compaction
+"""
+import pytest
+
+from core.config.llm_config import OLLAMA_KEEP_ALIVE
+from core.patches.history_compactor import HistoryCompactor, ollama_summarizer
+from test_ollama_pool import StubOllama
+
+
+def conversation(count, size=400):
+    messages = [{"role": "system", "content": "You are an agent."},
+                {"role": "user", "content": "Do the task."}]
+    for index in range(count):
+        role = "assistant" if index % 2 == 0 else "user"
+        messages.append({"role": role, "content": f"message {index} " + "x" * size})
+    return messages
+
+
+@pytest.mark.parametrize("option", ["keep_last_messages", "chunk_messages"])
+def test_counts_below_one_are_rejected(option):
+    with pytest.raises(ValueError):
+        HistoryCompactor(**{option: 0})
+
+
+def test_keeps_last_messages_verbatim():
+    messages = conversation(20)
+    compactor = HistoryCompactor(token_threshold=100, keep_last_messages=3, chunk_messages=4)
+
+    compacted = compactor.compact(messages)
+
+    assert compacted[:2] == messages[:2]
+    assert compacted[2]["content"].startswith("Summary of earlier conversation")
+    assert compacted[-3:] == messages[-3:]
+    assert len(compacted) < len(messages)
+
+
+def test_short_conversations_are_untouched():
+    messages = conversation(2, size=10)
+    assert HistoryCompactor(token_threshold=6000).compact(messages) is messages
+
+
+def test_tool_results_stay_with_their_call():
+    messages = conversation(12)
+    messages += [{"role": "assistant", "content": "calling tool", "tool_calls": [{"id": "1"}]},
+                 {"role": "tool", "content": "result " + "y" * 400, "tool_call_id": "1"}]
+    compactor = HistoryCompactor(token_threshold=100, keep_last_messages=1, chunk_messages=4)
+
+    compacted = compactor.compact(messages)
+
+    assert compacted[-2:] == messages[-2:]
+
+
+def test_summaries_keep_the_summary_model_resident():
+    stub = StubOllama()
+    try:
+        summary = ollama_summarizer("qwen3", base_url=stub.url)([{"role": "user", "content": "hello"}])
+    finally:
+        stub.close()
+
+    assert summary == stub.url
+    path, body = stub.bodies[0]
+    assert path == "/api/generate" and body["keep_alive"] == OLLAMA_KEEP_ALIVE
@@ -0,0 +1,102 @@
+"""
+Tests for the LiteLLM patches, each in a fresh interpreter since they patch litellm globally
+"""
+import importlib.util
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from test_ollama_pool import StubOllama
+
+pytestmark = pytest.mark.skipif(importlib.util.find_spec("litellm") is None, reason="litellm is not installed")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_script(source, **env):
+    env = dict(os.environ, LITELLM_LOCAL_MODEL_COST_MAP="True", PYTHONPATH=ROOT, **env)
+    result = subprocess.run([sys.executable, "-c", textwrap.dedent(source)], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def test_failed_sub_patch_is_retried_on_first_use():
+    output = run_script("""
+        import core.patches.litellm_patch as litellm_patch
+        import core.patches.history_compactor as history_compactor
+
+        # Make the completion patch fail once
+        real = history_compactor.HistoryCompactor
+        def broken(*args, **kwargs):
+            raise RuntimeError("not yet")
+        history_compactor.HistoryCompactor = broken
+
+        import litellm
+        assert not litellm_patch._patched
+        assert litellm.completion.__code__.co_name == "retry_patch_then_call"
+        assert litellm.embedding.__code__.co_name == "retry_patch_then_call"
+        real_completion, real_embedding = litellm.completion.__wrapped__, litellm.embedding.__wrapped__
+        # The embedding patch from the failed attempt was rolled back, so it isn't stacked
+        assert real_embedding.__code__.co_name != "safe_embedding"
+
+        # The next call retries patching before it runs; the server doesn't exist
+        history_compactor.HistoryCompactor = real
+        try:
+            litellm.completion(model="ollama/none", messages=[{"role": "user", "content": "hi"}],
+                               api_base="http://127.0.0.1:9", num_retries=0)
+        except Exception:
+            pass
+        assert litellm_patch._patched
+        assert litellm.embedding.__code__.co_name == "safe_embedding"
+        assert litellm.embedding.__wrapped__ is real_embedding
+        assert litellm.completion.__wrapped__ is real_completion
+        assert litellm_patch._import_hook not in __import__("sys").meta_path
+        print("ok")
+    """)
+    assert output.strip().endswith("ok")
+
+
+def test_embeddings_keep_the_model_resident():
+    stub = StubOllama()
+    try:
+        run_script("""
+            import core.patches.litellm_patch
+            import litellm
+            litellm.embedding(model="text-embedding-3-small", input=["batched"])
+            litellm.embedding(model="ollama/nomic-embed-text", input=["sent as-is"], dimensions=2)
+        """, OLLAMA_BASE_URLS=stub.url)
+    finally:
+        stub.close()
+
+    embeds = [body for path, body in stub.bodies if path == "/api/embed"]
+    assert [body["input"] for body in embeds] == [["batched"], ["sent as-is"]]
+    assert all(body["keep_alive"] == "60m" for body in embeds)
+
+
+def test_completions_use_the_prompt_compiler_and_report_cache_reuse():
+    stub = StubOllama()
+    stub.prompt_eval_count = 3
+    try:
+        output = run_script("""
+            import core.patches.litellm_patch
+            from core.patches.prompt_cache_stats import prompt_cache_tracker
+            import litellm
+            litellm.completion(model="ollama/qwen3", messages=[
+                {"role": "system", "content": "You are a careful software architect. " * 20},
+                {"role": "user", "content": "Pick a database."}])
+            print(prompt_cache_tracker.summary())
+        """, OLLAMA_BASE_URLS=stub.url)
+    finally:
+        stub.close()
+
+    # LiteLLM may also look the model up on /api/show
+    body, = [body for path, body in stub.bodies if path == "/api/generate"]
+    assert "Pick a database." in body["prompt"]
+    assert body["keep_alive"] == "60m" and "keep_alive" not in body.get("options", {})
+    summary = eval(output.strip().splitlines()[-1])
+    assert summary["calls"] == 1 and summary["evaluated_prompt_tokens"] == 3
+    assert summary["prompt_tokens"] > 100 and summary["cache_reuse"] > 0.9
@@ -0,0 +1,163 @@
+"""
+Tests for the Ollama endpoint pool against stub servers on localhost
+"""
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from core.ollama_pool import OllamaEndpointPool
+
+
+class StubOllama:
+    """Minimal Ollama stand-in serving /api/tags, /api/generate and /api/embed"""
+
+    def __init__(self):
+        self.status = 200  # Status returned by /api/generate
+        self.healthy = True  # Whether /api/tags answers 200
+        self.delay = 0.0
+        self.prompt_eval_count = 1  # Prompt tokens /api/generate claims to have evaluated
+        self.requests = 0
+        self.bodies = []  # (path, JSON body) of every POST
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._reply(200 if stub.healthy else 503, {"models": []})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                stub.requests += 1
+                stub.bodies.append((self.path, body))
+                time.sleep(stub.delay)
+                if self.path == "/api/embed":
+                    self._reply(stub.status, {"embeddings": [[0.5, 0.5] for _ in body["input"]],
+                                              "prompt_eval_count": len(body["input"])})
+                else:
+                    self._reply(stub.status, {"response": stub.url, "done": True,
+                                              "prompt_eval_count": stub.prompt_eval_count, "eval_count": 1})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def unused_url():
+    """URL of a localhost port nothing listens on, so connections are refused"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+def generate(url):
+    response = requests.post(f"{url}/api/generate", json={"prompt": "hi"}, timeout=5)
+    response.raise_for_status()
+    return response.json()["response"]
+
+
+@pytest.fixture
+def stubs():
+    servers = [StubOllama() for _ in range(3)]
+    yield servers
+    for server in servers:
+        server.close()
+
+
+def test_requests_go_to_least_outstanding_endpoint(stubs):
+    pool = OllamaEndpointPool([stub.url for stub in stubs])
+    stubs[0].delay = stubs[1].delay = 0.5
+
+    # Two slow requests occupy the first two servers
+    results = []
+    workers = [threading.Thread(target=lambda: results.append(pool.call(generate))) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+        time.sleep(0.1)
+
+    assert pool.call(generate) == stubs[2].url
+    for worker in workers:
+        worker.join()
+    assert sorted(results) == sorted([stubs[0].url, stubs[1].url])
+
+
+def test_call_fails_over_when_endpoint_refuses_connections(stubs):
+    refused = unused_url()
+    pool = OllamaEndpointPool([refused, stubs[0].url])
+
+    assert pool.call(generate) == stubs[0].url
+    assert not pool.endpoints[0].healthy
+
+
+def test_call_fails_over_on_server_error(stubs):
+    stubs[0].status = 500
+    pool = OllamaEndpointPool([stubs[0].url, stubs[1].url])
+
+    assert pool.call(generate) == stubs[1].url
+    assert stubs[0].requests == 1
+    assert not pool.endpoints[0].healthy
+
+
+def test_client_errors_are_not_retried(stubs):
+    stubs[0].status = 400
+    pool = OllamaEndpointPool([stubs[0].url, stubs[1].url])
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        pool.call(generate)
+    assert stubs[1].requests == 0
+
+
+def test_call_raises_when_every_endpoint_fails(stubs):
+    stubs[0].status = stubs[1].status = 503
+    pool = OllamaEndpointPool([stubs[0].url, stubs[1].url])
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        pool.call(generate)
+    assert stubs[0].requests == stubs[1].requests == 1
+
+
+def test_failed_endpoint_is_retried_after_cooldown(stubs):
+    pool = OllamaEndpointPool([stubs[0].url, stubs[1].url], failure_cooldown=0.3)
+    stubs[0].status = 500
+    assert pool.call(generate) == stubs[1].url
+
+    # Within the cooldown the failed server stays out of rotation
+    stubs[0].status = 200
+    assert pool.call(generate) == stubs[1].url
+    assert stubs[0].requests == 1
+
+    # Once the cooldown has passed it is health-checked and used again
+    time.sleep(0.35)
+    assert pool.call(generate) == stubs[0].url
+    assert pool.endpoints[0].healthy
+
+
+def test_endpoint_failing_health_check_stays_out_of_rotation(stubs):
+    pool = OllamaEndpointPool([stubs[0].url, stubs[1].url], failure_cooldown=0.1)
+    stubs[0].status = 500
+    pool.call(generate)
+
+    stubs[0].healthy = False
+    time.sleep(0.15)
+    assert pool.call(generate) == stubs[1].url
+    assert stubs[0].requests == 1
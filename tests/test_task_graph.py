@@ -0,0 +1,145 @@
+"""
+Tests for the task graph and its parallel executor, with stand-ins for CrewAI tasks
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core.task_executor import TaskGraphExecutor
+from core.task_graph import TaskGraph
+
+
+class FakeTask:
+    """Records what it ran with, like a CrewAI Task's execute_sync"""
+
+    def __init__(self, description, agent, delay=0.0):
+        self.description = description
+        self.agent = agent
+        self.delay = delay
+        self.context = None
+        self.tools = []
+        self.output = None
+        self.seen_context = None
+
+    def execute_sync(self, agent, context, tools):
+        self.seen_context = context
+        time.sleep(self.delay)
+        self.output = SimpleNamespace(raw=f"{self.description} done", agent=agent.role)
+        return self.output
+
+
+def agent(role):
+    return SimpleNamespace(role=role, tools=[])
+
+
+@pytest.fixture
+def graph():
+    """plan -> (build, tests) -> review"""
+    tasks = {name: FakeTask(name, agent(name), delay=0.2) for name in ("plan", "build", "tests", "review")}
+    graph = TaskGraph()
+    graph.add(tasks["plan"])
+    graph.add(tasks["build"], depends_on=[tasks["plan"]])
+    graph.add(tasks["tests"], depends_on=[tasks["plan"]])
+    graph.add(tasks["review"], depends_on=[tasks["build"], tasks["tests"]])
+    return graph, tasks
+
+
+def test_wire_context_restores_previous_contexts(graph):
+    graph, tasks = graph
+    tasks["review"].context = ["original"]
+
+    with graph.wire_context(graph.tasks):
+        assert tasks["review"].context == [tasks["build"], tasks["tests"]]
+        assert tasks["build"].context == [tasks["plan"]]
+
+    assert tasks["review"].context == ["original"]
+    assert tasks["build"].context is None
+
+
+def test_wire_context_restores_contexts_when_the_run_fails(graph):
+    graph, tasks = graph
+    with pytest.raises(RuntimeError):
+        with graph.wire_context(graph.tasks):
+            raise RuntimeError("kickoff failed")
+    assert all(task.context is None for task in tasks.values())
+
+
+def test_executor_runs_independent_tasks_concurrently(graph):
+    graph, tasks = graph
+    start = time.perf_counter()
+
+    outputs = TaskGraphExecutor(graph, max_concurrency=2).run()
+
+    # plan, then build and tests together, then review
+    assert time.perf_counter() - start < 0.75
+    assert [output.raw for output in outputs] == ["plan done", "build done", "tests done", "review done"]
+    assert tasks["review"].seen_context == "build done\n\n----------\n\ntests done"
+
+
+def test_executor_leaves_task_contexts_alone(graph):
+    graph, tasks = graph
+    TaskGraphExecutor(graph, max_concurrency=2).run()
+    assert all(task.context is None for task in tasks.values())
+
+
+def test_tasks_of_the_same_agent_do_not_overlap(graph):
+    graph, tasks = graph
+    shared = agent("engineer")
+    tasks["build"].agent = tasks["tests"].agent = shared
+    running, overlapped = set(), []
+    lock = threading.Lock()
+
+    def tracked(task):
+        execute = task.execute_sync
+
+        def execute_sync(agent, context, tools):
+            with lock:
+                if agent.role in running:
+                    overlapped.append(task.description)
+                running.add(agent.role)
+            try:
+                return execute(agent, context, tools)
+            finally:
+                with lock:
+                    running.discard(agent.role)
+        return execute_sync
+
+    for task in tasks.values():
+        task.execute_sync = tracked(task)
+
+    TaskGraphExecutor(graph, max_concurrency=4).run()
+    assert overlapped == []
+
+
+def test_feedback_reruns_the_tasks_it_applies_to_and_their_dependents(graph):
+    graph, tasks = graph
+    feedback = FakeTask("feedback", agent("director"))
+
+    round_graph = graph.copy()
+    round_graph.add(feedback)
+    round_graph.add(tasks["build"], depends_on=[feedback])
+    round_tasks = round_graph.affected_by([feedback])
+
+    assert round_tasks == [feedback, tasks["build"], tasks["review"]]
+    assert round_graph.dependencies(tasks["build"]) == [tasks["plan"], feedback]
+    with round_graph.wire_context(round_tasks):
+        # CrewAI rejects a crew whose tasks use later tasks of the crew as context
+        for index, task in enumerate(round_tasks):
+            assert all(round_tasks.index(c) < index for c in task.context or () if c in round_tasks)
+
+    # The round's edges stay off the shared graph
+    assert feedback not in graph
+    assert graph.dependencies(tasks["build"]) == [tasks["plan"]]
+
+
+def test_executor_refuses_to_run_without_a_dependencys_output(graph):
+    graph, tasks = graph
+    with pytest.raises(ValueError, match="plan"):
+        TaskGraphExecutor(graph, max_concurrency=2).run([tasks["build"], tasks["review"]])
+    assert tasks["build"].output is None
+
+    tasks["plan"].output = SimpleNamespace(raw="stored plan", agent="plan")
+    TaskGraphExecutor(graph, max_concurrency=2).run([tasks["build"]])
+    assert tasks["build"].seen_context == "stored plan"
@@ -0,0 +1,22 @@
+"""
+Tests for model warm-up against stub Ollama servers
+"""
+from core.warmup import start_model_warmup, wait_for_model_warmup
+from test_ollama_pool import StubOllama
+
+
+def test_every_model_is_warmed_on_every_server():
+    stubs = [StubOllama(), StubOllama()]
+    try:
+        futures = start_model_warmup({"qwen3": False, "nomic-embed-text": True}, keep_alive="60m",
+                                     base_urls=[stub.url for stub in stubs])
+        assert wait_for_model_warmup(futures)
+    finally:
+        for stub in stubs:
+            stub.close()
+
+    assert len(futures) == 4
+    for stub in stubs:
+        assert sorted((path, body["model"]) for path, body in stub.bodies) == [
+            ("/api/embed", "nomic-embed-text"), ("/api/generate", "qwen3")]
+        assert all(body["keep_alive"] == "60m" for _, body in stub.bodies)